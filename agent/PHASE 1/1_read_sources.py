@@ -4,20 +4,102 @@ Incremental Change Detector & Consolidated Source of Truth Generator
 Detects new changes from all data sources and creates a single markdown file for LLM processing.
 """
 
+import io
 import json
 import asyncio
-import hashlib
 import os
+import re
+import fnmatch
+from functools import lru_cache
+from hashlib import blake2b
 import subprocess
+from collections import Counter, defaultdict
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Set
+from typing import List, Dict, Any, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 import aiohttp
 import aiofiles
-from gitpython import Repo
+from gitpython import Repo, NULL_TREE
 
-@dataclass
+try:
+    import orjson  # Faster state (de)serialization; stdlib json is the fallback
+except ImportError:
+    orjson = None
+
+# Git diff change types mapped onto ChangeDetection.change_type
+GIT_CHANGE_TYPES = {"A": "added", "D": "deleted", "M": "modified", "R": "modified", "T": "modified"}
+
+# File suffixes used to categorize changes in the consolidated file
+CODE_EXTENSIONS = ('.py', '.js', '.ts', '.jsx', '.tsx')
+DOC_EXTENSIONS = ('.md', '.rst', '.txt')
+CONFIG_EXTENSIONS = ('.json', '.yml', '.yaml', '.env')
+
+# Maximum number of file reads kept in flight while scanning local sources
+FILE_READ_QUEUE_DEPTH = 64
+
+# Only the first CONTENT_PREVIEW_BYTES of a file are kept on a ChangeDetection
+CONTENT_PREVIEW_BYTES = 5000
+HASH_CHUNK_BYTES = 65536
+
+def _hash_and_head(path: Path, head_bytes: int = CONTENT_PREVIEW_BYTES) -> Tuple[str, bytes]:
+    """Stream-hash a file in fixed-size chunks, capturing its first head_bytes along the way.
+    The checksum is a BLAKE2b digest (faster than MD5) used only for change detection."""
+    hasher = blake2b(digest_size=32)
+    head = b""
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            hasher.update(chunk)
+            if len(head) < head_bytes:
+                head += chunk[:head_bytes - len(head)]
+    return hasher.hexdigest(), head
+
+def _split_glob(pattern: str) -> Tuple[str, ...]:
+    """Split a pathlib-style glob pattern into its path segments"""
+    return tuple(part for part in pattern.replace("\\", "/").split("/") if part and part != ".")
+
+def _glob_match(path_parts: Tuple[str, ...], pattern_parts: Tuple[str, ...]) -> bool:
+    """Segment-wise pathlib-style glob match; '**' matches zero or more directories"""
+    if not pattern_parts:
+        return not path_parts
+    head = pattern_parts[0]
+    if head == "**":
+        return any(_glob_match(path_parts[i:], pattern_parts[1:]) for i in range(len(path_parts) + 1))
+    return bool(path_parts) and fnmatch.fnmatchcase(path_parts[0], head) and _glob_match(path_parts[1:], pattern_parts[1:])
+
+@lru_cache(maxsize=None)
+def _compile_file_patterns(patterns: Tuple[str, ...]) -> Optional[re.Pattern]:
+    """Compile file globs into a single regex alternation; None means every file matches"""
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+# Parsed data source configuration keyed by resolved path, as (mtime, config data)
+_config_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+# Shared HTTP session for API-backed sources (Google Docs, Slack, ...), so
+# connections are pooled across sources and pipeline runs
+_session: Optional[aiohttp.ClientSession] = None
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session, creating it on first use"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=10, enable_cleanup_closed=True),
+            timeout=aiohttp.ClientTimeout(total=60, connect=10)
+        )
+    return _session
+
+async def close_session():
+    """Close the shared aiohttp session if one was opened"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+@dataclass(slots=True, frozen=True)
 class ChangeDetection:
     """Represents a detected change in a data source"""
     source_name: str
@@ -28,7 +110,7 @@ class ChangeDetection:
     metadata: Dict[str, Any]
     evidence_id: str  # Unique identifier for this piece of evidence
 
-@dataclass
+@dataclass(slots=True)
 class DataSourceConfig:
     """Configuration for a data source"""
     name: str
@@ -47,6 +129,13 @@ class IncrementalChangeDetector:
         self.data_sources: List[DataSourceConfig] = []
         self.last_run_state: Dict[str, Any] = {}
         self.detected_changes: List[ChangeDetection] = []
+        # Checksums computed during detection, reused by save_current_state
+        self._checksum_cache: Dict[str, Dict[str, str]] = {}
+        # One directory walk per run, shared by every local_files source
+        self._file_index: Optional[List[Tuple[str, ...]]] = None
+        self._path_scan_cache: Dict[Tuple[str, ...], List[Path]] = {}
+        # HEAD commit per Git source, captured while detecting changes
+        self._current_head_cache: Dict[str, str] = {}
         
         self.load_configuration()
         self.load_last_run_state()
@@ -54,11 +143,19 @@ class IncrementalChangeDetector:
     def load_configuration(self):
         """Load data source configurations"""
         if self.config_file.exists():
-            with open(self.config_file, 'r') as f:
-                config_data = json.load(f)
-                self.data_sources = [
-                    DataSourceConfig(**source) for source in config_data.get("data_sources", [])
-                ]
+            # Reuse the parsed config while the file is unchanged (e.g. repeated scheduled runs)
+            cache_key = str(self.config_file.resolve())
+            mtime = self.config_file.stat().st_mtime
+            cached = _config_cache.get(cache_key)
+            if cached is not None and cached[0] == mtime:
+                config_data = cached[1]
+            else:
+                with open(self.config_file, 'r') as f:
+                    config_data = json.load(f)
+                _config_cache[cache_key] = (mtime, config_data)
+            self.data_sources = [
+                DataSourceConfig(**source) for source in config_data.get("data_sources", [])
+            ]
         else:
             # Create default configuration
             self.create_default_configuration()
@@ -103,8 +200,11 @@ class IncrementalChangeDetector:
     def load_last_run_state(self):
         """Load state from last run to determine what's new"""
         if self.state_file.exists():
-            with open(self.state_file, 'r') as f:
-                self.last_run_state = json.load(f)
+            if orjson is not None:
+                self.last_run_state = orjson.loads(self.state_file.read_bytes())
+            else:
+                with open(self.state_file, 'r') as f:
+                    self.last_run_state = json.load(f)
         else:
             self.last_run_state = {
                 "last_run_timestamp": None,
@@ -122,50 +222,69 @@ class IncrementalChangeDetector:
             "processed_changes": [change.evidence_id for change in self.detected_changes]
         }
         
-        with open(self.state_file, 'w') as f:
-            json.dump(current_state, f, indent=2)
+        if orjson is not None:
+            self.state_file.write_bytes(orjson.dumps(current_state, option=orjson.OPT_INDENT_2))
+        else:
+            with open(self.state_file, 'w') as f:
+                json.dump(current_state, f, indent=2)
     
     async def detect_all_changes(self) -> List[ChangeDetection]:
         """Detect changes across all configured data sources"""
         print("🔍 Detecting changes across all data sources...")
         
         self.detected_changes = []
+        self._checksum_cache = {}
+        self._file_index = None
+        self._path_scan_cache = {}
+        self._current_head_cache = {}
         
-        for source in self.data_sources:
-            if not source.enabled:
+        # Sources are independent and I/O-bound, so scan them all concurrently
+        enabled_sources = [source for source in self.data_sources if source.enabled]
+        results = await asyncio.gather(
+            *[self._dispatch(source) for source in enabled_sources], return_exceptions=True
+        )
+        
+        for source, result in zip(enabled_sources, results):
+            if isinstance(result, Exception):
+                print(f"❌ Error detecting changes in {source.name}: {result}")
                 continue
-                
-            print(f"📊 Checking {source.name} ({source.type})")
-            
-            try:
-                if source.type == "github":
-                    changes = await self._detect_git_changes(source)
-                elif source.type == "local_files":
-                    changes = await self._detect_file_changes(source)
-                elif source.type == "google_docs":
-                    changes = await self._detect_google_docs_changes(source)
-                elif source.type == "slack":
-                    changes = await self._detect_slack_changes(source)
-                else:
-                    print(f"⚠️ Unknown source type: {source.type}")
-                    continue
-                
-                self.detected_changes.extend(changes)
-                print(f"✅ Found {len(changes)} changes in {source.name}")
-                
-            except Exception as e:
-                print(f"❌ Error detecting changes in {source.name}: {e}")
+            self.detected_changes.extend(result)
         
         print(f"🎯 Total changes detected: {len(self.detected_changes)}")
         return self.detected_changes
     
+    async def _dispatch(self, source: DataSourceConfig) -> List[ChangeDetection]:
+        """Run the change detector matching the source's type"""
+        print(f"📊 Checking {source.name} ({source.type})")
+        
+        if source.type == "github":
+            changes = await self._detect_git_changes(source)
+        elif source.type == "local_files":
+            changes = await self._detect_file_changes(source)
+        elif source.type == "google_docs":
+            changes = await self._detect_google_docs_changes(source)
+        elif source.type == "slack":
+            changes = await self._detect_slack_changes(source)
+        else:
+            print(f"⚠️ Unknown source type: {source.type}")
+            return []
+        
+        print(f"✅ Found {len(changes)} changes in {source.name}")
+        return changes
+    
     async def _detect_git_changes(self, source: DataSourceConfig) -> List[ChangeDetection]:
         """Detect changes in Git repository"""
+        # GitPython is blocking, so keep it off the event loop
+        return await asyncio.to_thread(self._detect_git_changes_sync, source)
+    
+    def _detect_git_changes_sync(self, source: DataSourceConfig) -> List[ChangeDetection]:
+        """Walk new commits in a Git repository and record each changed file"""
         changes = []
         repo_path = source.config.get("path", ".")
         
         try:
             repo = Repo(repo_path)
+            self._current_head_cache[source.name] = repo.head.commit.hexsha
             last_commit_hash = self.last_run_state.get("git_commit_hashes", {}).get(source.name)
             
             if last_commit_hash:
@@ -176,17 +295,38 @@ class IncrementalChangeDetector:
                 since_date = datetime.now() - timedelta(days=1)
                 commits = list(repo.iter_commits(since=since_date))
             
+            # Compile the source's file patterns once, outside the commit loop
+            pattern_re = _compile_file_patterns(tuple(source.config.get("file_patterns", [])))
+            evidence_prefix = f"git_{source.name}_"
+            
             for commit in commits:
+                commit_evidence_prefix = evidence_prefix + commit.hexsha + "_"
+                
+                # Tree diff against the first parent lists the changed paths without
+                # the numstat pass that commit.stats runs
+                if commit.parents:
+                    diffs = commit.parents[0].diff(commit)
+                else:
+                    diffs = commit.diff(NULL_TREE)
+                
                 # Process each file in the commit
-                for file_path in commit.stats.files.keys():
-                    if self._should_process_file(file_path, source.config.get("file_patterns", [])):
+                for diff in diffs:
+                    file_path = diff.b_path or diff.a_path
+                    if pattern_re is None or pattern_re.match(file_path):
                         try:
-                            file_content = (repo.git.show(f"{commit.hexsha}:{file_path}"))
+                            change_type = GIT_CHANGE_TYPES.get(diff.change_type, "modified")
+                            if change_type == "deleted":
+                                file_content = ""
+                            else:
+                                # Served by GitPython's persistent `git cat-file --batch` process,
+                                # so there is no fork/exec per file like `git show`
+                                _, _, _, blob = repo.git.get_object_data(f"{commit.hexsha}:{file_path}")
+                                file_content = blob.decode('utf-8', errors='ignore')
                             
                             change = ChangeDetection(
                                 source_name=source.name,
                                 source_type="github_commit",
-                                change_type="modified",  # Could be refined to detect add/delete
+                                change_type=change_type,
                                 timestamp=commit.committed_datetime,
                                 content=file_content[:5000],  # Limit content size
                                 metadata={
@@ -195,7 +335,7 @@ class IncrementalChangeDetector:
                                     "author": str(commit.author),
                                     "file_path": file_path
                                 },
-                                evidence_id=f"git_{source.name}_{commit.hexsha}_{file_path}"
+                                evidence_id=commit_evidence_prefix + file_path
                             )
                             changes.append(change)
                         except Exception as e:
@@ -214,83 +354,133 @@ class IncrementalChangeDetector:
         current_checksums = {}
         last_checksums = self.last_run_state.get("file_checksums", {})
         
-        for pattern in file_patterns:
-            for file_path in Path(".").glob(pattern):
-                if file_path.is_file():
-                    try:
-                        content = file_path.read_text(encoding='utf-8', errors='ignore')
-                        checksum = hashlib.md5(content.encode()).hexdigest()
-                        current_checksums[str(file_path)] = checksum
-                        
-                        # Check if file is new or modified
-                        if str(file_path) not in last_checksums or last_checksums[str(file_path)] != checksum:
-                            change = ChangeDetection(
-                                source_name=source.name,
-                                source_type="file_modification",
-                                change_type="modified" if str(file_path) in last_checksums else "added",
-                                timestamp=datetime.fromtimestamp(file_path.stat().st_mtime),
-                                content=content[:5000],  # Limit content size
-                                metadata={
-                                    "file_path": str(file_path),
-                                    "file_size": file_path.stat().st_size,
-                                    "checksum": checksum
-                                },
-                                evidence_id=f"file_{source.name}_{checksum}_{file_path.name}"
-                            )
-                            changes.append(change)
-                    except Exception as e:
-                        print(f"⚠️ Could not read file {file_path}: {e}")
+        # Collect candidates first so reads and hashing can overlap across threads
+        file_paths = self._scan_once(tuple(sorted(file_patterns)))
+        
+        # Submit every read up front and await them together so the event loop
+        # stays free for other sources while up to FILE_READ_QUEUE_DEPTH reads are in flight
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=FILE_READ_QUEUE_DEPTH) as executor:
+            results = await asyncio.gather(*[
+                loop.run_in_executor(executor, self._hash_one, file_path) for file_path in file_paths
+            ])
+        
+        # Build change records on the calling thread, in scan order
+        evidence_prefix = f"file_{source.name}_"
+        for file_path, result in zip(file_paths, results):
+            if result is None:
+                continue
+            checksum, mtime, size, content = result
+            current_checksums[str(file_path)] = checksum
+            
+            # Check if file is new or modified
+            if str(file_path) not in last_checksums or last_checksums[str(file_path)] != checksum:
+                change = ChangeDetection(
+                    source_name=source.name,
+                    source_type="file_modification",
+                    change_type="modified" if str(file_path) in last_checksums else "added",
+                    timestamp=datetime.fromtimestamp(mtime),
+                    content=content,
+                    metadata={
+                        "file_path": str(file_path),
+                        "file_size": size,
+                        "checksum": checksum
+                    },
+                    evidence_id="".join((evidence_prefix, checksum, "_", file_path.name))
+                )
+                changes.append(change)
         
         # Update checksums for this source
         source_key = f"file_checksums_{source.name}"
         if source_key not in self.last_run_state:
             self.last_run_state[source_key] = {}
         self.last_run_state[source_key].update(current_checksums)
+        self._checksum_cache[source.name] = current_checksums
         
         return changes
     
+    def _hash_one(self, file_path: Path) -> Optional[Tuple[str, float, int, str]]:
+        """Read and checksum a single file; returns (checksum, mtime, size, content preview)"""
+        try:
+            checksum, head = _hash_and_head(file_path)
+            stat = file_path.stat()
+            # Translate newlines as text-mode reads (the former read_text) did, so CRLF files add no stray \r
+            preview = head.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+            return checksum, stat.st_mtime, stat.st_size, preview
+        except Exception as e:
+            print(f"⚠️ Could not read file {file_path}: {e}")
+            return None
+    
     async def _detect_google_docs_changes(self, source: DataSourceConfig) -> List[ChangeDetection]:
         """Detect changes in Google Docs (placeholder for API integration)"""
-        # TODO: Implement Google Docs API integration
+        # TODO: Implement Google Docs API integration (use get_session() for HTTP calls)
         print("📄 Google Docs change detection not yet implemented")
         return []
     
     async def _detect_slack_changes(self, source: DataSourceConfig) -> List[ChangeDetection]:
         """Detect changes in Slack (placeholder for API integration)"""
-        # TODO: Implement Slack API integration  
+        # TODO: Implement Slack API integration (use get_session() for HTTP calls)
         print("💬 Slack change detection not yet implemented")
         return []
     
-    def _should_process_file(self, file_path: str, patterns: List[str]) -> bool:
-        """Check if file matches any of the patterns"""
-        if not patterns:
-            return True
-            
-        for pattern in patterns:
-            if file_path.endswith(pattern.replace("*", "")):
-                return True
-        return False
+    def _scan_once(self, patterns_key: Tuple[str, ...]) -> List[Path]:
+        """Return files matching any of the glob patterns, using a single cached directory walk"""
+        if patterns_key in self._path_scan_cache:
+            return self._path_scan_cache[patterns_key]
+        
+        if self._file_index is None:
+            self._file_index = self._walk_local_files()
+        
+        split_patterns = [_split_glob(pattern) for pattern in patterns_key]
+        matches = [
+            Path(*parts) for parts in self._file_index
+            if any(_glob_match(parts, pattern_parts) for pattern_parts in split_patterns)
+        ]
+        self._path_scan_cache[patterns_key] = matches
+        return matches
+    
+    def _walk_local_files(self) -> List[Tuple[str, ...]]:
+        """Walk the working tree once, only as deep as the configured local_files patterns require"""
+        all_patterns = [
+            _split_glob(pattern)
+            for source in self.data_sources if source.type == "local_files"
+            for pattern in source.config.get("paths", [])
+        ]
+        if not all_patterns:
+            return []
+        max_depth = None if any("**" in parts for parts in all_patterns) else max(len(parts) for parts in all_patterns)
+        
+        files = []
+        for dirpath, dirnames, filenames in os.walk(".", followlinks=False):
+            rel_parts = Path(dirpath).parts if dirpath != "." else ()
+            if max_depth is not None and len(rel_parts) + 1 >= max_depth:
+                dirnames[:] = []  # Deeper entries cannot match any pattern
+            files.extend(rel_parts + (name,) for name in filenames)
+        return files
     
     def _calculate_current_file_checksums(self) -> Dict[str, str]:
         """Calculate checksums for all tracked files"""
         checksums = {}
         for source in self.data_sources:
             if source.type == "local_files":
-                for pattern in source.config.get("paths", []):
-                    for file_path in Path(".").glob(pattern):
-                        if file_path.is_file():
-                            try:
-                                content = file_path.read_text(encoding='utf-8', errors='ignore')
-                                checksums[str(file_path)] = hashlib.md5(content.encode()).hexdigest()
-                            except:
-                                pass
+                source_checksums = self._checksum_cache.get(source.name)
+                if source_checksums is not None:
+                    # Reuse the checksums from this run's detection pass instead of re-reading every file
+                    checksums.update(source_checksums)
+                    continue
+                # Not scanned this run (disabled, or its detection failed): hash its files now
+                for file_path in self._scan_once(tuple(sorted(source.config.get("paths", [])))):
+                    try:
+                        checksums[str(file_path)] = _hash_and_head(file_path, 0)[0]
+                    except:
+                        pass
         return checksums
     
     def _get_current_git_commits(self) -> Dict[str, str]:
         """Get current HEAD commit for all Git sources"""
-        commits = {}
+        commits = dict(self._current_head_cache)
         for source in self.data_sources:
-            if source.type == "github":
+            if source.type == "github" and source.name not in commits:
                 try:
                     repo = Repo(source.config.get("path", "."))
                     commits[source.name] = repo.head.commit.hexsha
@@ -298,6 +488,18 @@ class IncrementalChangeDetector:
                     pass
         return commits
 
+@dataclass(slots=True)
+class ChangeAggregates:
+    """Everything the consolidated file sections need, computed in one pass over the changes"""
+    changes: List[ChangeDetection]  # Sorted newest first
+    source_counts: Dict[str, int]
+    type_counts: Dict[str, int]
+    changes_by_source: Dict[str, List[ChangeDetection]]
+    category_buckets: Dict[str, List[ChangeDetection]]
+    timestamp_labels: Dict[datetime, str]  # Formatted once per distinct timestamp
+    earliest: Optional[datetime]
+    latest: Optional[datetime]
+
 class ConsolidatedSourceOfTruthGenerator:
     """Generates consolidated markdown file from detected changes"""
     
@@ -312,67 +514,99 @@ class ConsolidatedSourceOfTruthGenerator:
         
         print(f"📝 Generating consolidated source of truth: {output_file}")
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            self._write_header(f, changes)
-            self._write_change_summary(f, changes)
-            self._write_changes_by_source(f, changes)
-            self._write_changes_by_type(f, changes)
-            self._write_detailed_evidence(f, changes)
+        aggregates = self._aggregate(changes)
+        
+        # Build the whole document in memory, then encode and write it once
+        buffer = io.StringIO()
+        self._write_header(buffer, aggregates)
+        self._write_change_summary(buffer, aggregates)
+        self._write_changes_by_source(buffer, aggregates)
+        self._write_changes_by_type(buffer, aggregates)
+        self._write_detailed_evidence(buffer, aggregates)
+        output_file.write_bytes(buffer.getvalue().encode('utf-8'))
         
         print(f"✅ Consolidated file generated with {len(changes)} changes")
         return output_file
     
-    def _write_header(self, f, changes: List[ChangeDetection]):
+    def _aggregate(self, changes: List[ChangeDetection]) -> ChangeAggregates:
+        """Sort changes once (newest first) and build every per-section grouping in a single pass"""
+        changes = sorted(changes, key=lambda x: x.timestamp, reverse=True)
+        
+        source_counts = Counter()
+        type_counts = Counter()
+        changes_by_source = defaultdict(list)
+        category_buckets = {
+            "Technical Code": [],
+            "Documentation": [],
+            "Configuration": [],
+            "Other": []
+        }
+        timestamp_labels = {}
+        
+        for change in changes:
+            source_counts[change.source_name] += 1
+            type_counts[change.change_type] += 1
+            changes_by_source[change.source_name].append(change)
+            
+            file_path = change.metadata.get('file_path', '')
+            if file_path.endswith(CODE_EXTENSIONS):
+                category_buckets["Technical Code"].append(change)
+            elif file_path.endswith(DOC_EXTENSIONS):
+                category_buckets["Documentation"].append(change)
+            elif file_path.endswith(CONFIG_EXTENSIONS):
+                category_buckets["Configuration"].append(change)
+            else:
+                category_buckets["Other"].append(change)
+            
+            # Files in a commit share one timestamp, so most of these are cache hits
+            if change.timestamp not in timestamp_labels:
+                timestamp_labels[change.timestamp] = change.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        
+        return ChangeAggregates(
+            changes=changes,
+            source_counts=source_counts,
+            type_counts=type_counts,
+            changes_by_source=changes_by_source,
+            category_buckets=category_buckets,
+            timestamp_labels=timestamp_labels,
+            earliest=changes[-1].timestamp if changes else None,
+            latest=changes[0].timestamp if changes else None
+        )
+    
+    def _write_header(self, f, aggregates: ChangeAggregates):
         """Write file header with metadata"""
         f.write("# Consolidated Source of Truth - New Changes\n\n")
         f.write(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"**Total Changes**: {len(changes)}\n")
-        f.write(f"**Change Period**: {self._get_change_period(changes)}\n\n")
+        f.write(f"**Total Changes**: {len(aggregates.changes)}\n")
+        f.write(f"**Change Period**: {self._get_change_period(aggregates)}\n\n")
         f.write("---\n\n")
     
-    def _write_change_summary(self, f, changes: List[ChangeDetection]):
+    def _write_change_summary(self, f, aggregates: ChangeAggregates):
         """Write executive summary of changes"""
         f.write("## 📊 Change Summary\n\n")
         
-        # Count by source
-        source_counts = {}
-        for change in changes:
-            source_counts[change.source_name] = source_counts.get(change.source_name, 0) + 1
-        
         f.write("### By Data Source\n")
-        for source, count in sorted(source_counts.items()):
+        for source, count in sorted(aggregates.source_counts.items()):
             f.write(f"- **{source}**: {count} changes\n")
         
-        # Count by type
-        type_counts = {}
-        for change in changes:
-            type_counts[change.change_type] = type_counts.get(change.change_type, 0) + 1
-        
         f.write("\n### By Change Type\n")
-        for change_type, count in sorted(type_counts.items()):
+        for change_type, count in sorted(aggregates.type_counts.items()):
             f.write(f"- **{change_type.title()}**: {count} changes\n")
         
         f.write("\n---\n\n")
     
-    def _write_changes_by_source(self, f, changes: List[ChangeDetection]):
+    def _write_changes_by_source(self, f, aggregates: ChangeAggregates):
         """Write changes organized by data source"""
         f.write("## 🗂️ Changes by Data Source\n\n")
         
-        # Group changes by source
-        changes_by_source = {}
-        for change in changes:
-            if change.source_name not in changes_by_source:
-                changes_by_source[change.source_name] = []
-            changes_by_source[change.source_name].append(change)
-        
-        for source_name, source_changes in sorted(changes_by_source.items()):
+        for source_name, source_changes in sorted(aggregates.changes_by_source.items()):
             f.write(f"### {source_name}\n")
             f.write(f"*{len(source_changes)} changes detected*\n\n")
             
-            for change in sorted(source_changes, key=lambda x: x.timestamp, reverse=True):
+            for change in source_changes:
                 f.write(f"#### [{change.evidence_id}]\n")
                 f.write(f"- **Type**: {change.change_type}\n")
-                f.write(f"- **Timestamp**: {change.timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write(f"- **Timestamp**: {aggregates.timestamp_labels[change.timestamp]}\n")
                 if change.metadata.get('file_path'):
                     f.write(f"- **File**: `{change.metadata['file_path']}`\n")
                 if change.metadata.get('commit_message'):
@@ -381,30 +615,11 @@ class ConsolidatedSourceOfTruthGenerator:
         
         f.write("---\n\n")
     
-    def _write_changes_by_type(self, f, changes: List[ChangeDetection]):
+    def _write_changes_by_type(self, f, aggregates: ChangeAggregates):
         """Write changes organized by type (technical, documentation, configuration)"""
         f.write("## 🏷️ Changes by Category\n\n")
         
-        # Categorize changes
-        categories = {
-            "Technical Code": [],
-            "Documentation": [],
-            "Configuration": [],
-            "Other": []
-        }
-        
-        for change in changes:
-            file_path = change.metadata.get('file_path', '')
-            if any(ext in file_path for ext in ['.py', '.js', '.ts', '.jsx', '.tsx']):
-                categories["Technical Code"].append(change)
-            elif any(ext in file_path for ext in ['.md', '.rst', '.txt']):
-                categories["Documentation"].append(change)
-            elif any(ext in file_path for ext in ['.json', '.yml', '.yaml', '.env']):
-                categories["Configuration"].append(change)
-            else:
-                categories["Other"].append(change)
-        
-        for category, category_changes in categories.items():
+        for category, category_changes in aggregates.category_buckets.items():
             if category_changes:
                 f.write(f"### {category} ({len(category_changes)} changes)\n")
                 for change in category_changes:
@@ -413,17 +628,17 @@ class ConsolidatedSourceOfTruthGenerator:
         
         f.write("---\n\n")
     
-    def _write_detailed_evidence(self, f, changes: List[ChangeDetection]):
+    def _write_detailed_evidence(self, f, aggregates: ChangeAggregates):
         """Write detailed evidence for each change"""
         f.write("## 📋 Detailed Evidence\n\n")
         f.write("*Complete content of all detected changes for LLM analysis*\n\n")
         
-        for i, change in enumerate(sorted(changes, key=lambda x: x.timestamp, reverse=True), 1):
+        for i, change in enumerate(aggregates.changes, 1):
             f.write(f"### Evidence {i}: {change.evidence_id}\n\n")
             f.write(f"**Source**: {change.source_name}\n")
             f.write(f"**Type**: {change.source_type}\n")
             f.write(f"**Change**: {change.change_type}\n")
-            f.write(f"**Timestamp**: {change.timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"**Timestamp**: {aggregates.timestamp_labels[change.timestamp]}\n")
             
             # Write metadata
             f.write(f"**Metadata**:\n")
@@ -436,14 +651,13 @@ class ConsolidatedSourceOfTruthGenerator:
             f.write("\n```\n\n")
             f.write("---\n\n")
     
-    def _get_change_period(self, changes: List[ChangeDetection]) -> str:
+    def _get_change_period(self, aggregates: ChangeAggregates) -> str:
         """Get the time period covered by changes"""
-        if not changes:
+        if not aggregates.changes:
             return "No changes"
         
-        timestamps = [change.timestamp for change in changes]
-        earliest = min(timestamps)
-        latest = max(timestamps)
+        earliest = aggregates.earliest
+        latest = aggregates.latest
         
         if earliest.date() == latest.date():
             return f"{earliest.strftime('%Y-%m-%d')}"
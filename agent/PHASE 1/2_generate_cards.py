@@ -4,53 +4,133 @@ Intelligent Guru Card Generator
 Processes consolidated markdown file and generates Guru cards following system guidelines.
 """
 
+import io
 import json
 import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter, defaultdict
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
 from datetime import datetime
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, Timeout
 import argparse
 
-@dataclass
-class GuruCardGeneration:
-    """Represents a generated Guru card with metadata"""
-    title: str
-    target_audience: str
-    primary_purpose: str
-    priority_level: str
-    estimated_complexity: str
-    card_type: str  # "technical", "process", "overview", "troubleshooting"
-    content: str
-    evidence_sources: List[str]
-    confidence_score: float
-    dependencies: List[str]
-    suggested_collection: str
-    suggested_board: str
-    generation_timestamp: str
-    token_usage: Dict[str, int]
+try:
+    import orjson  # Faster JSON parsing and output (serializes dataclasses natively); stdlib json is the fallback
+except ImportError:
+    orjson = None
 
-class IntelligentCardGenerator:
-    """Generates Guru cards from consolidated source of truth using LLM intelligence"""
-    
-    def __init__(self, api_key: str, output_dir: str = "./generated_cards"):
-        self.api_key = api_key
-        self.client = AsyncOpenAI(api_key=api_key)
-        self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True)
-        
-        # Load Guru system guidelines
-        self.guru_guidelines = self._load_guru_guidelines()
-        self.success_criteria = self._load_success_criteria()
+try:
+    import tiktoken  # Exact token counts for prompt truncation; 4 chars/token is the fallback
+except ImportError:
+    tiktoken = None
+
+# Bump whenever the card generation prompt or model changes so cached cards are regenerated
+PROMPT_VERSION = "2"
+
+# Default model for card generation; overridable with --model
+DEFAULT_GENERATION_MODEL = "gpt-4o-mini"
+
+# Print a progress line every time this many more characters of the streamed response arrive
+STREAM_PROGRESS_CHARS = 4000
+
+# Prompt budget for card generation: 128k context limit, minus headroom
+MAX_PROMPT_TOKENS = 120000
+
+# Consolidated content longer than this is split at section headings into chunks generated in parallel
+CONTENT_CHUNK_CHARS = 20000
+
+# Consolidated content shorter than this (ignoring surrounding whitespace) cannot evidence a card; skip the LLM call
+MIN_GENERATION_CONTENT_CHARS = 200
+
+# Most recently used LLM cache entries kept on disk; older ones are pruned after each run
+LLM_CACHE_MAX_ENTRIES = 500
+
+# Maximum number of card generation requests in flight at once
+GENERATION_CONCURRENCY = 8
+
+# The OpenAI client retries rate limits (429), 5xx and connection errors with exponential backoff
+GENERATION_MAX_RETRIES = 5
+GENERATION_TIMEOUT = Timeout(60.0, connect=5.0)  # Read timeout applies between streamed chunks
+
+# Priority levels in the order the markdown summary and card sections list them
+CARD_PRIORITIES = ("critical", "important", "nice-to-have")
+
+# "## " and "### " headings in the consolidated markdown, where it can be split cleanly
+SECTION_HEADING_RE = re.compile(r'^(?=#{2,3} )', re.MULTILINE)
+
+@lru_cache(maxsize=None)
+def _token_encoding(model: str):
+    """tiktoken encoding for a model, or None if tiktoken is missing or cannot load it (e.g. offline)"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")  # Encoding of the gpt-4o family
+    except Exception as e:
+        print(f"⚠️ Could not load tiktoken encoding, estimating 4 characters per token: {e}")
+        return None
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON bytes or text, raising json.JSONDecodeError on bad input"""
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch one type
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def _write_json(path: Path, data: Any, indent: bool = True):
+    """Write data (cards allowed) as UTF-8 JSON, using orjson when available"""
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0))
+        return
+    if isinstance(data, list):
+        data = [item.to_dict() if isinstance(item, GuruCardGeneration) else item for item in data]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2 if indent else None, ensure_ascii=False)
+
+def _split_content(content: str, max_chars: int = CONTENT_CHUNK_CHARS) -> List[str]:
+    """Split markdown into chunks of at most max_chars, packing whole sections where possible"""
+    if len(content) <= max_chars:
+        return [content]
     
-    def _load_guru_guidelines(self) -> str:
-        """Load Guru system guidelines from the master instructions"""
-        guidelines_path = Path("agent/MAIN/UNIFIED_GURU_SYSTEM_MASTER_INSTRUCTIONS.md")
-        if guidelines_path.exists():
-            return guidelines_path.read_text(encoding='utf-8')
-        else:
-            return """
+    chunks = []
+    current = []
+    current_size = 0
+    for section in SECTION_HEADING_RE.split(content):
+        # A single section longer than a chunk is cut into fixed-size windows
+        for start in range(0, len(section), max_chars):
+            piece = section[start:start + max_chars]
+            if current and current_size + len(piece) > max_chars:
+                chunks.append("".join(current))
+                current = []
+                current_size = 0
+            current.append(piece)
+            current_size += len(piece)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+@lru_cache(maxsize=1)
+def _load_guru_guidelines() -> str:
+    """Load Guru system guidelines from the master instructions (read once per process)"""
+    guidelines_path = Path("agent/MAIN/UNIFIED_GURU_SYSTEM_MASTER_INSTRUCTIONS.md")
+    if guidelines_path.exists():
+        return guidelines_path.read_text(encoding='utf-8')
+    else:
+        return """
             CRITICAL CARD NAMING REQUIREMENTS:
             - Card titles MUST start with: Who, What, Where, Why, OR How
             - Focus on PAIN addressed, NOT audience or purpose
@@ -63,10 +143,9 @@ class IntelligentCardGenerator:
             - Biz Team Reader: Needs direct answers, no technical details
             - YOU (Expert): Deep knowledge, building advanced features
             """
-    
-    def _load_success_criteria(self) -> str:
-        """Load success criteria from master instructions"""
-        return """
+
+# Success criteria from the master instructions, included in every generation prompt
+SUCCESS_CRITERIA = """
         GURU CARD SUCCESS CRITERIA:
         - Must enable immediate action or decision-making
         - Should become reusable "source of truth" that teammates share
@@ -85,6 +164,132 @@ class IntelligentCardGenerator:
         - Enables AI augmentation through good structure
         - Keeps organization safe with consistent processes
         """
+
+# System message sent with every generation request; one shared object, identical prefix for OpenAI prompt caching
+CARD_GENERATION_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are an expert technical documentation specialist with deep understanding of developer workflows and knowledge management systems. Your goal is to create genuinely useful Guru cards that solve real problems for development teams."
+}
+
+# Card generation prompt. Static instructions come first and the consolidated content last,
+# so requests share the longest possible identical prefix.
+CARD_GENERATION_PROMPT_TEMPLATE = """You are creating Guru cards for a development team from the consolidated changes at the end of this prompt.
+
+SYSTEM GUIDELINES:
+{guidelines}
+
+SUCCESS CRITERIA:
+{success_criteria}
+
+REQUIREMENTS:
+1. Title starts with Who/What/Where/Why/How and names the pain solved, not the audience or purpose (e.g. "HOW to Deploy the Backend API").
+2. Target one reader: Tech Reader - NEW HIRE | Tech Reader - YOUR TEAM | Tech Reader - OTHER TEAM | Biz Team Reader | YOU (Expert).
+3. One topic, one intent; enables immediate action; reusable as the source of truth; ages well.
+4. Only create cards backed by evidence in the content, citing the specific changes, files or processes. No assumptions.
+5. Card content sections: # Title, ## Quick Answer, ## Implementation Steps, ## Troubleshooting, ## Related Information.
+
+Find the pain points, questions and affected workflows the changes create, keep those that justify a dedicated card, then write each card.
+
+Respond with JSON:
+{{"analysis_summary": {{"total_changes_analyzed": number, "primary_themes": [str], "affected_workflows": [str], "key_pain_points": [str]}},
+ "generated_cards": [{{"title": str, "target_audience": str, "primary_purpose": str, "priority_level": "critical|important|nice-to-have", "estimated_complexity": "simple|medium|complex", "card_type": "technical|process|overview|troubleshooting", "content": markdown str, "evidence_sources": [str], "confidence_score": 0.0-1.0, "dependencies": [card titles], "suggested_collection": str, "suggested_board": str, "reasoning": str}}],
+ "recommendations": {{"high_priority_cards": [str], "content_gaps": [str], "suggested_workflows": [str]}}}}
+
+CONSOLIDATED CONTENT:
+{content}
+"""
+
+@dataclass(slots=True)
+class GuruCardGeneration:
+    """Represents a generated Guru card with metadata"""
+    title: str
+    target_audience: str
+    primary_purpose: str
+    priority_level: str
+    estimated_complexity: str
+    card_type: str  # "technical", "process", "overview", "troubleshooting"
+    content: str
+    evidence_sources: List[str]
+    confidence_score: float
+    dependencies: List[str]
+    suggested_collection: str
+    suggested_board: str
+    generation_timestamp: str
+    token_usage: Dict[str, int]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow field dict for JSON output (lists are shared, unlike asdict's deep copy)"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def _card_field_defaults() -> Dict[str, Any]:
+    """Fallback values for card fields missing from the LLM response (fresh lists on every call)"""
+    return {
+        "title": "Untitled Card",
+        "target_audience": "Unknown",
+        "primary_purpose": "Unknown purpose",
+        "priority_level": "nice-to-have",
+        "estimated_complexity": "medium",
+        "card_type": "general",
+        "content": "No content provided",
+        "evidence_sources": [],
+        "confidence_score": 0.5,
+        "dependencies": [],
+        "suggested_collection": "General",
+        "suggested_board": "Miscellaneous"
+    }
+
+def _render_card(card: GuruCardGeneration, index: int) -> str:
+    """Markdown section for one card under its priority heading"""
+    parts = [
+        f"### {index}. {card.title}\n\n",
+        f"**Audience**: {card.target_audience}\n",
+        f"**Purpose**: {card.primary_purpose}\n",
+        f"**Complexity**: {card.estimated_complexity}\n",
+        f"**Type**: {card.card_type}\n",
+        f"**Collection**: {card.suggested_collection}\n",
+        f"**Board**: {card.suggested_board}\n",
+        f"**Confidence**: {card.confidence_score:.2f}\n\n"
+    ]
+    
+    if card.evidence_sources:
+        parts.append("**Evidence Sources**:\n")
+        parts.extend(f"- {source}\n" for source in card.evidence_sources)
+        parts.append("\n")
+    
+    if card.dependencies:
+        parts.append("**Dependencies**:\n")
+        parts.extend(f"- {dep}\n" for dep in card.dependencies)
+        parts.append("\n")
+    
+    parts.append(f"**Card Content**:\n```markdown\n{card.content}\n```\n\n---\n\n")
+    return "".join(parts)
+
+class IntelligentCardGenerator:
+    """Generates Guru cards from consolidated source of truth using LLM intelligence"""
+    
+    def __init__(self, api_key: str, output_dir: str = "./generated_cards", model: str = DEFAULT_GENERATION_MODEL,
+                 use_cache: bool = True):
+        self.api_key = api_key
+        self.model = model
+        # One client for the whole run, so parallel chunk requests share its keep-alive connection pool
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=GENERATION_MAX_RETRIES, timeout=GENERATION_TIMEOUT)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True)
+        
+        # Load Guru system guidelines
+        self.guru_guidelines = _load_guru_guidelines()
+        self.success_criteria = SUCCESS_CRITERIA
+        # Everything in a generation prompt except the content; the same for every chunk
+        self._prompt_structure = CARD_GENERATION_PROMPT_TEMPLATE + self.guru_guidelines + self.success_criteria
+        
+        # LLM responses keyed by prompt hash, so unchanged content (or unchanged chunks of edited content)
+        # is not regenerated
+        self.use_cache = use_cache
+        self.llm_cache_dir = self.output_dir / ".llm_cache"
+        self.llm_cache_dir.mkdir(exist_ok=True)
+        
+        # Bounds concurrent generation requests when content is split into chunks
+        self._generation_semaphore = asyncio.Semaphore(GENERATION_CONCURRENCY)
     
     async def process_consolidated_file(self, consolidated_file_path: Path) -> List[GuruCardGeneration]:
         """Process consolidated markdown file and generate Guru cards"""
@@ -96,168 +301,175 @@ class IntelligentCardGenerator:
         # Generate cards using LLM
         cards = await self._generate_cards_from_content(consolidated_content)
         
-        # Save generated cards
-        self._save_generated_cards(cards)
+        # Save generated cards (and prune the LLM cache) in worker threads, side by side,
+        # so large JSON/markdown writes don't block the event loop
+        saves = [asyncio.to_thread(self._save_generated_cards, cards)]
+        if self.use_cache:
+            saves.append(asyncio.to_thread(self._prune_llm_cache))
+        await asyncio.gather(*saves)
         
         print(f"✅ Generated {len(cards)} Guru cards")
         return cards
     
+    def _prompt_cache_key(self, content: str) -> str:
+        """Hash a prompt (minus the content's generation time) together with the prompt version and model"""
+        hasher = hashlib.sha256(f"{PROMPT_VERSION}\0{self.model}\0".encode('utf-8'))
+        for line in content.splitlines():
+            if not line.startswith("**Generated**:"):
+                hasher.update(line.encode('utf-8'))
+                hasher.update(b"\n")
+        return hasher.hexdigest()
+    
     async def _generate_cards_from_content(self, content: str) -> List[GuruCardGeneration]:
         """Use LLM to generate Guru cards from consolidated content"""
         
-        # Create comprehensive prompt with guidelines
-        prompt = self._create_card_generation_prompt(content)
+        if len(content.strip()) < MIN_GENERATION_CONTENT_CHARS:
+            print(f"⚠️ Consolidated content is empty or too short ({len(content.strip())} characters), skipping card generation")
+            return []
+        
+        chunks = _split_content(content)
+        if len(chunks) > 1:
+            print(f"✂️ Splitting content into {len(chunks)} chunks for parallel generation")
         
-        # Call LLM
-        response = await self._call_llm_for_generation(prompt)
+        # Create a prompt with guidelines for each chunk and generate them concurrently
+        responses = await asyncio.gather(
+            *[self._generate_for_chunk(chunk) for chunk in chunks],
+            return_exceptions=True
+        )
+        
+        # Any failed chunk fails the run, so callers never record the changes as processed without
+        # their cards; chunks that succeeded are in the LLM cache and are not regenerated on the rerun
+        failures = [(i, response) for i, response in enumerate(responses, 1) if isinstance(response, Exception)]
+        if failures:
+            for i, error in failures:
+                print(f"❌ Error generating cards for chunk {i}/{len(chunks)}: {error}")
+            raise failures[0][1]
+        
+        # Merge the chunk responses, keeping the first card generated for each title
+        merged = {"generated_cards": [], "token_usage": Counter()}
+        seen_titles = set()
+        for response in responses:
+            for card_data in response.get("generated_cards", []):
+                # Malformed entries pass through untouched; the parser skips them with a warning
+                if isinstance(card_data, dict):
+                    title_key = str(card_data.get("title", "")).lower().strip()
+                    if title_key in seen_titles:
+                        continue
+                    seen_titles.add(title_key)
+                merged["generated_cards"].append(card_data)
+            merged["token_usage"].update(response.get("token_usage", {}))
+        merged["token_usage"] = dict(merged["token_usage"])
         
         # Parse and structure response
-        return self._parse_card_generation_response(response)
+        return self._parse_card_generation_response(merged)
+    
+    async def _generate_for_chunk(self, content: str) -> Dict[str, Any]:
+        """Build the prompt for one content chunk and call the LLM under the concurrency limit"""
+        prompt = self._create_card_generation_prompt(content)
+        
+        # Ignores the content's generation time, so re-running on unchanged evidence hits the cache
+        cache_path = self.llm_cache_dir / f"{self._prompt_cache_key(prompt)}.json"
+        if self.use_cache and cache_path.exists():
+            try:
+                response = _json_loads(cache_path.read_bytes())
+                os.utime(cache_path)  # Mark as recently used so pruning keeps it
+                return response
+            except (OSError, json.JSONDecodeError):
+                pass  # Unreadable entry: fall through and regenerate
+        
+        async with self._generation_semaphore:
+            response = await self._call_llm_for_generation(prompt)
+        
+        # Responses that failed to parse are not cached, so the next run retries them
+        if self.use_cache and not response.get("parse_failed"):
+            self._write_llm_cache(cache_path, response)
+        return response
+    
+    def _write_llm_cache(self, cache_path: Path, response: Dict[str, Any]):
+        """Atomically write a cache entry so concurrent or interrupted runs never see partial JSON"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.llm_cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_json_dumps(response))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"⚠️ Could not write LLM cache entry {cache_path.name}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _prune_llm_cache(self):
+        """Delete all but the LLM_CACHE_MAX_ENTRIES most recently used cache entries"""
+        entries = []
+        with os.scandir(self.llm_cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        entries.append((entry.stat().st_mtime_ns, entry.path))
+                    except OSError:
+                        continue
+        if len(entries) <= LLM_CACHE_MAX_ENTRIES:
+            return
+        entries.sort(reverse=True)
+        for _, path in entries[LLM_CACHE_MAX_ENTRIES:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
     
     def _create_card_generation_prompt(self, content: str) -> str:
         """Create comprehensive LLM prompt for card generation"""
         
-        # Calculate available space for content (leaving room for prompt structure)
-        max_prompt_tokens = 120000  # GPT-4 Turbo context limit
-        prompt_structure_estimate = 3000  # Estimated tokens for prompt structure
-        available_content_tokens = max_prompt_tokens - prompt_structure_estimate
-        
-        # Rough estimate: 4 characters per token
-        max_content_chars = available_content_tokens * 4
-        
-        # Use full content if it fits, otherwise truncate with warning
-        if len(content) > max_content_chars:
-            print(f"⚠️ Content too large ({len(content)} chars), truncating to {max_content_chars} chars")
-            content_to_use = content[:max_content_chars]
+        # Tokens never outnumber UTF-8 bytes, so content that fits by byte count is used as is without
+        # tokenizing; chunking keeps content far below the budget, so truncation is only a safety net
+        if len(content.encode('utf-8')) <= MAX_PROMPT_TOKENS - len(self._prompt_structure.encode('utf-8')):
+            content_to_use = content
         else:
+            content_to_use = self._truncate_to_prompt_budget(content)
+        
+        if content_to_use is content:
             print(f"✅ Using full consolidated content ({len(content)} characters)")
-            content_to_use = content
         
-        return f"""
-You are an expert technical documentation specialist creating Guru cards for a development team.
-
-SYSTEM GUIDELINES:
-{self.guru_guidelines}
-
-SUCCESS CRITERIA:
-{self.success_criteria}
-
-YOUR TASK:
-Analyze the consolidated changes below and generate comprehensive Guru cards that solve real team problems.
-
-CONSOLIDATED CONTENT:
-{content_to_use}
-
-CRITICAL REQUIREMENTS:
-
-1. CARD NAMING (MANDATORY):
-   - MUST start with: Who | What | Where | Why | How
-   - Focus on PAIN addressed, NOT audience or purpose
-   - Examples: "HOW to Deploy the Backend API", "WHAT are our CSAM Detection Dependencies"
-
-2. USER-FOCUSED DESIGN:
-   - Each card solves a specific pain point
-   - Target one of these user types:
-     * Tech Reader - NEW HIRE (learning from scratch)
-     * Tech Reader - YOUR TEAM (building on existing knowledge)
-     * Tech Reader - OTHER TEAM (specific integration need)
-     * Biz Team Reader (direct answers, no technical details)
-     * YOU (expert needing advanced details)
-
-3. SUCCESS-ORIENTED CONTENT:
-   - Enable immediate action/decision-making
-   - Become reusable "source of truth"
-   - Scoped like microservice (one topic, one intent)
-   - Age well with clear maintenance needs
-
-4. EVIDENCE-BASED GENERATION:
-   - Only create cards supported by evidence in the content
-   - Reference specific changes, files, or processes mentioned
-   - Avoid assumptions not supported by the data
-
-5. PRACTICAL STRUCTURE:
-   - Quick answer for people in hurry
-   - Step-by-step implementation details
-   - Troubleshooting for common issues
-   - Links to related information
-
-ANALYSIS INSTRUCTIONS:
-
-Step 1: Identify PAIN POINTS from the changes
-- What problems would these changes create for team members?
-- What questions would people ask about these changes?
-- What workflows might be affected?
-
-Step 2: Determine CARD OPPORTUNITIES
-- Which pain points justify a dedicated Guru card?
-- What knowledge gaps exist that cards could fill?
-- Which processes need documentation?
-
-Step 3: Design CARD SPECIFICATIONS
-- Create clear, pain-focused titles starting with Who/What/Where/Why/How
-- Identify target user type and their specific need
-- Define success criteria (what should someone accomplish?)
-
-Step 4: Generate CARD CONTENT
-- Structure for immediate usability
-- Include evidence from the consolidated content
-- Provide actionable steps and examples
-- Add troubleshooting guidance
-
-FORMAT YOUR RESPONSE AS JSON:
-{{
-  "analysis_summary": {{
-    "total_changes_analyzed": "number",
-    "primary_themes": ["theme1", "theme2", "theme3"],
-    "affected_workflows": ["workflow1", "workflow2"],
-    "key_pain_points": ["pain1", "pain2", "pain3"]
-  }},
-  "generated_cards": [
-    {{
-      "title": "HOW to [specific action/task]",
-      "target_audience": "Tech Reader - NEW HIRE",
-      "primary_purpose": "Solve the specific pain of [exactly what problem this addresses]",
-      "priority_level": "critical|important|nice-to-have",
-      "estimated_complexity": "simple|medium|complex",
-      "card_type": "technical|process|overview|troubleshooting",
-      "content": "FULL CARD CONTENT in markdown format with:\n# Title\n## Quick Answer\n## Implementation Steps\n## Troubleshooting\n## Related Information",
-      "evidence_sources": ["specific references to consolidated content"],
-      "confidence_score": 0.85,
-      "dependencies": ["other cards that should exist first"],
-      "suggested_collection": "Engineering|Product|Operations|etc",
-      "suggested_board": "specific board name based on workflow",
-      "reasoning": "Why this card is needed and how it serves users"
-    }}
-  ],
-  "recommendations": {{
-    "high_priority_cards": ["card titles that should be created first"],
-    "content_gaps": ["areas needing more information"],
-    "suggested_workflows": ["end-to-end processes that need card sequences"]
-  }}
-}}
-
-QUALITY CHECKLIST - Each card must:
-✅ Solve a real problem evidenced in the consolidated content
-✅ Have title starting with Who/What/Where/Why/How
-✅ Target specific user type with clear pain point
-✅ Provide actionable steps someone can follow immediately
-✅ Include troubleshooting for likely issues
-✅ Reference specific evidence from the changes
-✅ Enable successful task completion within reasonable time
-
-Generate cards that will genuinely help your teammates work more effectively!
-"""
+        return CARD_GENERATION_PROMPT_TEMPLATE.format_map({
+            "guidelines": self.guru_guidelines,
+            "success_criteria": self.success_criteria,
+            "content": content_to_use
+        })
+    
+    @cached_property
+    def _prompt_structure_tokens(self) -> Optional[int]:
+        """Token count of the prompt minus its content, or None if tiktoken is unavailable"""
+        encoding = _token_encoding(self.model)
+        if encoding is None:
+            return None
+        return len(encoding.encode(self._prompt_structure, disallowed_special=()))
+    
+    def _truncate_to_prompt_budget(self, content: str) -> str:
+        """Return content cut to the tokens left in the prompt budget (content itself if it fits)"""
+        if self._prompt_structure_tokens is not None:
+            # Count tokens exactly and cut the content at a token boundary
+            encoding = _token_encoding(self.model)
+            available_content_tokens = MAX_PROMPT_TOKENS - self._prompt_structure_tokens
+            content_tokens = encoding.encode(content, disallowed_special=())
+            if len(content_tokens) <= available_content_tokens:
+                return content
+            print(f"⚠️ Content too large ({len(content_tokens)} tokens), truncating to {available_content_tokens} tokens")
+            return encoding.decode(content_tokens[:available_content_tokens])
+        
+        # Rough estimate: 4 characters per token
+        max_content_chars = (MAX_PROMPT_TOKENS - len(self._prompt_structure) // 4) * 4
+        if len(content) <= max_content_chars:
+            return content
+        print(f"⚠️ Content too large ({len(content)} chars), truncating to {max_content_chars} chars")
+        return content[:max_content_chars]
     
     async def _call_llm_for_generation(self, prompt: str) -> Dict[str, Any]:
         """Call OpenAI API for card generation"""
         
-        response = await self.client.chat.completions.create(
-            model="gpt-4-turbo-preview",  # Use most capable model
+        # Stream the response so progress is visible while the long JSON answer is generated
+        stream = await self.client.chat.completions.create(
+            model=self.model,
             messages=[
-                {
-                    "role": "system", 
-                    "content": "You are an expert technical documentation specialist with deep understanding of developer workflows and knowledge management systems. Your goal is to create genuinely useful Guru cards that solve real problems for development teams."
-                },
+                CARD_GENERATION_SYSTEM_MESSAGE,
                 {
                     "role": "user", 
                     "content": prompt
@@ -265,18 +477,40 @@ Generate cards that will genuinely help your teammates work more effectively!
             ],
             temperature=0.1,  # Low temperature for consistency
             max_tokens=8000,  # Allow for detailed responses
-            response_format={"type": "json_object"}  # Ensure JSON response
+            response_format={"type": "json_object"},  # Ensure JSON response
+            stream=True,
+            stream_options={"include_usage": True}  # Final chunk carries token usage
         )
         
-        content = response.choices[0].message.content
+        parts = []
+        received_chars = 0
+        next_progress = STREAM_PROGRESS_CHARS
+        usage = None
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                received_chars += len(delta)
+                if received_chars >= next_progress:
+                    print(f"⏳ Received {received_chars} characters of generated cards...")
+                    next_progress += STREAM_PROGRESS_CHARS
+        
+        content = "".join(parts)
+        cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if cached_tokens:
+            print(f"♻️ {cached_tokens} prompt tokens served from OpenAI's prompt cache")
         token_usage = {
-            "prompt_tokens": response.usage.prompt_tokens,
-            "completion_tokens": response.usage.completion_tokens,
-            "total_tokens": response.usage.total_tokens
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "total_tokens": usage.total_tokens if usage else 0
         }
         
         try:
-            parsed_response = json.loads(content)
+            parsed_response = _json_loads(content)
             parsed_response["token_usage"] = token_usage
             return parsed_response
         except json.JSONDecodeError as e:
@@ -285,7 +519,8 @@ Generate cards that will genuinely help your teammates work more effectively!
             return {
                 "generated_cards": [],
                 "analysis_summary": {"error": f"Failed to parse JSON: {e}"},
-                "token_usage": token_usage
+                "token_usage": token_usage,
+                "parse_failed": True
             }
     
     def _parse_card_generation_response(self, response: Dict[str, Any]) -> List[GuruCardGeneration]:
@@ -297,28 +532,20 @@ Generate cards that will genuinely help your teammates work more effectively!
             print("⚠️ No cards found in LLM response")
             return cards
         
+        token_usage = response.get("token_usage", {})
+        generation_timestamp = datetime.now().isoformat()  # One timestamp for every card in the response
         for card_data in response["generated_cards"]:
-            try:
-                card = GuruCardGeneration(
-                    title=card_data.get("title", "Untitled Card"),
-                    target_audience=card_data.get("target_audience", "Unknown"),
-                    primary_purpose=card_data.get("primary_purpose", "Unknown purpose"),
-                    priority_level=card_data.get("priority_level", "nice-to-have"),
-                    estimated_complexity=card_data.get("estimated_complexity", "medium"),
-                    card_type=card_data.get("card_type", "general"),
-                    content=card_data.get("content", "No content provided"),
-                    evidence_sources=card_data.get("evidence_sources", []),
-                    confidence_score=card_data.get("confidence_score", 0.5),
-                    dependencies=card_data.get("dependencies", []),
-                    suggested_collection=card_data.get("suggested_collection", "General"),
-                    suggested_board=card_data.get("suggested_board", "Miscellaneous"),
-                    generation_timestamp=datetime.now().isoformat(),
-                    token_usage=response.get("token_usage", {})
-                )
-                cards.append(card)
-            except Exception as e:
-                print(f"⚠️ Error parsing card data: {e}")
+            if not isinstance(card_data, dict):
+                print(f"⚠️ Error parsing card data: expected an object, got {type(card_data).__name__}")
                 continue
+            # Defaults first, then whichever known fields the LLM supplied (extra keys such as "reasoning" are dropped)
+            fields = _card_field_defaults()
+            fields.update((key, card_data[key]) for key in fields.keys() & card_data.keys())
+            cards.append(GuruCardGeneration(
+                **fields,
+                generation_timestamp=generation_timestamp,
+                token_usage=token_usage
+            ))
         
         return cards
     
@@ -328,13 +555,14 @@ Generate cards that will genuinely help your teammates work more effectively!
         
         # Save as JSON for programmatic access
         json_file = self.output_dir / f"generated_cards_{timestamp}.json"
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump([asdict(card) for card in cards], f, indent=2, ensure_ascii=False)
+        _write_json(json_file, cards)
         
         # Save as markdown for human review
         md_file = self.output_dir / f"generated_cards_{timestamp}.md"
-        with open(md_file, 'w', encoding='utf-8') as f:
-            self._write_cards_markdown(f, cards)
+        # Build the whole document in memory and write it in one call
+        buffer = io.StringIO()
+        self._write_cards_markdown(buffer, cards)
+        md_file.write_bytes(buffer.getvalue().encode('utf-8'))
         
         print(f"💾 Saved generated cards:")
         print(f"   JSON: {json_file}")
@@ -347,77 +575,55 @@ Generate cards that will genuinely help your teammates work more effectively!
         f.write(f"**Total Cards**: {len(cards)}\n\n")
         f.write("---\n\n")
         
-        # Summary by priority
-        f.write("## Priority Summary\n\n")
-        priority_counts = {}
+        # Group cards by priority in one pass
+        cards_by_priority = defaultdict(list)
         for card in cards:
-            priority_counts[card.priority_level] = priority_counts.get(card.priority_level, 0) + 1
+            cards_by_priority[card.priority_level].append(card)
         
-        for priority in ["critical", "important", "nice-to-have"]:
-            count = priority_counts.get(priority, 0)
+        # Summary by priority
+        f.write("## Priority Summary\n\n")
+        for priority in CARD_PRIORITIES:
+            count = len(cards_by_priority.get(priority, ()))
             f.write(f"- **{priority.title()}**: {count} cards\n")
         
         f.write("\n---\n\n")
         
         # Cards by priority
-        for priority in ["critical", "important", "nice-to-have"]:
-            priority_cards = [c for c in cards if c.priority_level == priority]
+        for priority in CARD_PRIORITIES:
+            priority_cards = cards_by_priority.get(priority)
             if priority_cards:
                 f.write(f"## {priority.title()} Priority Cards\n\n")
                 
                 for i, card in enumerate(priority_cards, 1):
-                    f.write(f"### {i}. {card.title}\n\n")
-                    f.write(f"**Audience**: {card.target_audience}\n")
-                    f.write(f"**Purpose**: {card.primary_purpose}\n")
-                    f.write(f"**Complexity**: {card.estimated_complexity}\n")
-                    f.write(f"**Type**: {card.card_type}\n")
-                    f.write(f"**Collection**: {card.suggested_collection}\n")
-                    f.write(f"**Board**: {card.suggested_board}\n")
-                    f.write(f"**Confidence**: {card.confidence_score:.2f}\n\n")
-                    
-                    if card.evidence_sources:
-                        f.write("**Evidence Sources**:\n")
-                        for source in card.evidence_sources:
-                            f.write(f"- {source}\n")
-                        f.write("\n")
-                    
-                    if card.dependencies:
-                        f.write("**Dependencies**:\n")
-                        for dep in card.dependencies:
-                            f.write(f"- {dep}\n")
-                        f.write("\n")
-                    
-                    f.write("**Card Content**:\n")
-                    f.write("```markdown\n")
-                    f.write(card.content)
-                    f.write("\n```\n\n")
-                    f.write("---\n\n")
+                    f.write(_render_card(card, i))
     
     def generate_implementation_plan(self, cards: List[GuruCardGeneration]) -> Dict[str, Any]:
         """Generate implementation plan for Phase 2"""
         
-        # Sort cards by priority and dependencies
-        critical_cards = [c for c in cards if c.priority_level == "critical"]
-        important_cards = [c for c in cards if c.priority_level == "important"]
-        
-        # Identify foundation cards (no dependencies)
-        foundation_cards = [c for c in critical_cards if not c.dependencies]
+        # Bucket cards by priority and collection in a single pass
+        cards_by_priority = defaultdict(list)
+        titles_by_collection = defaultdict(list)
+        foundation_cards = []  # Critical cards without dependencies
+        for c in cards:
+            cards_by_priority[c.priority_level].append(c)
+            titles_by_collection[c.suggested_collection].append(c.title)
+            if c.priority_level == "critical" and not c.dependencies:
+                foundation_cards.append(c)
+        critical_cards = cards_by_priority["critical"]
+        important_cards = cards_by_priority["important"]
         
         plan = {
             "phase_2_recommendations": {
                 "start_with": [c.title for c in foundation_cards[:3]],  # Top 3 foundation cards
                 "high_priority_sequence": [c.title for c in critical_cards],
-                "suggested_collections": list(set(c.suggested_collection for c in cards)),
+                "suggested_collections": list(titles_by_collection),
                 "estimated_effort": {
                     "critical_cards": len(critical_cards),
                     "important_cards": len(important_cards),
                     "total_estimated_hours": len(critical_cards) * 2 + len(important_cards) * 1.5
                 }
             },
-            "sme_assignments": {
-                collection: [c.title for c in cards if c.suggested_collection == collection]
-                for collection in set(c.suggested_collection for c in cards)
-            },
+            "sme_assignments": dict(titles_by_collection),
             "quality_checklist": [
                 "Verify technical accuracy with SME",
                 "Test all code examples and procedures",
@@ -436,11 +642,14 @@ async def main():
     parser.add_argument("--api-key", required=True, help="OpenAI API key")
     parser.add_argument("--consolidated-file", required=True, help="Path to consolidated changes file")
     parser.add_argument("--output-dir", default="./generated_cards", help="Output directory")
+    parser.add_argument("--model", default=DEFAULT_GENERATION_MODEL, help="OpenAI model used to generate cards")
+    parser.add_argument("--no-cache", action="store_true", help="Regenerate every card, ignoring cached LLM results")
     
     args = parser.parse_args()
     
     # Initialize generator
-    generator = IntelligentCardGenerator(args.api_key, args.output_dir)
+    generator = IntelligentCardGenerator(args.api_key, args.output_dir, model=args.model,
+                                         use_cache=not args.no_cache)
     
     # Process consolidated file
     consolidated_file = Path(args.consolidated_file)
@@ -458,8 +667,7 @@ async def main():
     
     # Save implementation plan
     plan_file = generator.output_dir / f"implementation_plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(plan_file, 'w', encoding='utf-8') as f:
-        json.dump(plan, f, indent=2)
+    _write_json(plan_file, plan)
     
     print(f"📋 Implementation plan saved: {plan_file}")
     print(f"✅ Card generation complete! Ready for Phase 2 engineer collaboration.")
@@ -7,11 +7,12 @@ Implements the user's vision: Change Detection -> Consolidated Source of Truth -
 import asyncio
 import argparse
 import json
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
 
-from incremental_change_detector import IncrementalChangeDetector, ConsolidatedSourceOfTruthGenerator
+from incremental_change_detector import IncrementalChangeDetector, ConsolidatedSourceOfTruthGenerator, close_session
 from intelligent_card_generator import IntelligentCardGenerator
 
 class MainOrchestrator:
@@ -81,6 +82,10 @@ class MainOrchestrator:
         except Exception as e:
             self.log_step(f"❌ Pipeline failed: {e}")
             raise
+        
+        finally:
+            # Release pooled HTTP connections held by the data sources
+            await close_session()
     
     async def run_webhook_triggered_pipeline(self, webhook_data: dict) -> dict:
         """Execute pipeline triggered by webhook (GitHub, Google Docs, etc.)"""
@@ -144,31 +149,22 @@ class MainOrchestrator:
     
     def _group_changes_by_source(self, changes) -> dict:
         """Group changes by data source"""
-        groups = {}
-        for change in changes:
-            groups[change.source_name] = groups.get(change.source_name, 0) + 1
-        return groups
+        return dict(Counter(change.source_name for change in changes))
     
     def _group_changes_by_type(self, changes) -> dict:
         """Group changes by type"""
-        groups = {}
-        for change in changes:
-            groups[change.change_type] = groups.get(change.change_type, 0) + 1
-        return groups
+        return dict(Counter(change.change_type for change in changes))
     
     def _group_cards_by_priority(self, cards) -> dict:
         """Group cards by priority level"""
+        # Fixed priority keys first (always present), then any unexpected levels
         groups = {"critical": 0, "important": 0, "nice-to-have": 0}
-        for card in cards:
-            groups[card.priority_level] = groups.get(card.priority_level, 0) + 1
+        groups.update(Counter(card.priority_level for card in cards))
         return groups
     
     def _group_cards_by_collection(self, cards) -> dict:
         """Group cards by suggested collection"""
-        groups = {}
-        for card in cards:
-            groups[card.suggested_collection] = groups.get(card.suggested_collection, 0) + 1
-        return groups
+        return dict(Counter(card.suggested_collection for card in cards))
     
     def _get_recommended_action(self, cards) -> str:
         """Get recommended next action based on pipeline results"""
@@ -259,4 +255,13 @@ async def main():
         exit(2)
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    try:
+        import uvloop  # libuv-based event loop, cheaper scheduling for many concurrent HTTP requests
+    except ImportError:
+        asyncio.run(main())
+    else:
+        if hasattr(uvloop, "run"):
+            uvloop.run(main())
+        else:
+            uvloop.install()  # uvloop < 0.18 has no uvloop.run
+            asyncio.run(main())
\ No newline at end of file
@@ -6,15 +6,187 @@ Automates the systematic analysis of all data sources to determine what Guru car
 
 import json
 import asyncio
-import aiohttp
 import csv
+import fnmatch
+import hashlib
 import os
+import tempfile
+import time
 from pathlib import Path
 from typing import List, Dict, Any, Set, Optional
+from collections import Counter
 from dataclasses import dataclass, asdict
+from functools import cached_property, lru_cache
 from datetime import datetime
 import argparse
-from analyzer import GuruCardAnalyzer
+from itertools import islice
+
+try:
+    import orjson  # Faster response parsing and cache (de)serialization; stdlib json is the fallback
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # Streams large card exports so only the sampled cards get parsed
+except ImportError:
+    ijson = None
+
+# Default model for source analysis; overridable with --model
+DEFAULT_LLM_MODEL = "gpt-4o-mini"
+
+# Maximum number of data sources analyzed by the LLM at the same time
+ANALYSIS_CONCURRENCY = 8
+
+# Retry policy for LLM calls: exponential backoff on rate limits and transient server errors
+LLM_MAX_ATTEMPTS = 3
+LLM_BACKOFF_BASE_SECONDS = 1.0
+LLM_BACKOFF_MAX_SECONDS = 30.0
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+# Most recently used LLM cache entries kept on disk; older ones are pruned after each run
+LLM_CACHE_MAX_ENTRIES = 500
+
+# Client-side OpenAI rate limits; tokens are estimated as prompt chars / 4 plus the completion budget
+LLM_MAX_COMPLETION_TOKENS = 2000
+LLM_REQUESTS_PER_SECOND = 50
+LLM_TOKENS_PER_MINUTE = 80_000
+
+# Write buffer for the tracking CSV files
+CSV_BUFFER_BYTES = 1 << 16
+
+# Directories never descended into while discovering data sources
+SKIP_DIRS = frozenset({".git", "node_modules", "__pycache__", ".venv", "dist", "build"})
+
+# How many directory levels below the workspace root are searched for README files
+MAX_SCAN_DEPTH = 6
+
+# Prompts only use the first 8000 characters of a source (300 per file in a docs directory),
+# so only read enough bytes to cover that many characters even if they are multi-byte UTF-8
+SOURCE_HEAD_BYTES = 32768
+DOC_DIR_HEAD_BYTES = 4096
+
+# System message sent with every analysis request; one shared object, identical prefix for OpenAI prompt caching
+ANALYSIS_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are an expert technical documentation analyst helping identify knowledge management needs."
+}
+
+# Static parts of the per-source analysis prompt; only the source header and content vary.
+# The "# Limit content..." text has always been sent with the prompt; keep it so cached analyses stay valid.
+ANALYSIS_PROMPT_HEAD = """
+You are analyzing a data source to identify what Guru cards need to exist for a development team.
+
+DATA SOURCE: """
+ANALYSIS_PROMPT_TAIL = """  # Limit content to prevent token overflow
+
+Based on this data source, identify:
+
+1. REQUIRED GURU CARDS: What specific cards would help team members work effectively with this system/process?
+
+2. KNOWLEDGE GAPS: What information is missing that new team members would need?
+
+3. REPEATED QUESTIONS: What questions would people likely ask about this content?
+
+4. UNDOCUMENTED PROCESSES: What processes are implied but not clearly documented?
+
+CRITICAL CARD NAMING REQUIREMENTS:
+- Card titles MUST start with: Who, What, Where, Why, OR How
+- Focus on PAIN addressed, NOT audience or purpose
+- Examples: "HOW to Deploy the API", "WHAT are our Database Dependencies", "WHERE to Find Error Logs"
+
+USER CATEGORIES (identify which applies):
+- Tech Reader - NEW HIRE: Needs to learn from scratch, one-time learning
+- Tech Reader - YOUR TEAM: Knows their domain, building frequently 
+- Tech Reader - OTHER TEAM: Knows their domain, specific integration need
+- Biz Team Reader: Needs direct answers, no technical details
+- YOU (Expert): Deep knowledge, building advanced features
+
+For each potential Guru card, provide:
+- Title (MUST start with Who/What/Where/Why/How and address specific pain)
+- Target Audience (one of the 5 user categories above)
+- Primary Purpose (what specific pain/problem it solves)
+- Priority Level (critical/important/nice-to-have)
+- Estimated Complexity (simple/medium/complex)
+- Evidence (specific examples from the content that support this need)
+
+Format your response as JSON:
+{
+  "cards_identified": [
+    {
+      "title": "HOW to configure X for Y",
+      "target_audience": "Tech Reader - NEW HIRE",
+      "primary_purpose": "Solve the pain of not knowing how to set up X when Y condition exists",
+      "priority_level": "critical",
+      "estimated_complexity": "medium",
+      "evidence": ["Specific quote or reference from content"],
+      "category": "technical"
+    }
+  ],
+  "knowledge_gaps": ["Gap 1", "Gap 2"],
+  "repeated_questions": ["Question 1", "Question 2"],
+  "undocumented_processes": ["Process 1", "Process 2"]
+}
+"""
+
+# Evidence snippets kept per consolidated card, however many sources surface it
+MAX_EVIDENCE_SNIPPETS = 10
+
+# Number of existing Guru cards from a processed export that are included in the prompt
+GURU_CARD_SAMPLE_SIZE = 10
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON bytes or text, raising json.JSONDecodeError on bad input"""
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch one type
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _read_head(path: Path, max_bytes: int) -> str:
+    """Read and decode at most max_bytes from the start of a file"""
+    stat = os.stat(path)
+    return _read_head_cached(str(path), stat.st_mtime_ns, stat.st_size, max_bytes)
+
+
+@lru_cache(maxsize=1024)
+def _read_head_cached(path: str, mtime_ns: int, size: int, max_bytes: int) -> str:
+    """_read_head memoized per file version; mtime and size are only part of the key,
+    so a file that changes is read again while repeat reads of an unchanged one are free"""
+    with open(path, 'rb') as f:
+        text = f.read(max_bytes).decode('utf-8', errors='ignore')
+    # Translate newlines as text-mode reads (the former read_text) did, so prompts and cache keys match
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class TokenBucket:
+    """Async token bucket holding up to `capacity` tokens, refilled evenly over `per_seconds`"""
+    
+    def __init__(self, capacity: float, per_seconds: float):
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` tokens are available and take them; waiters are served in order"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
 
 @dataclass
 class DataSource:
@@ -55,13 +227,17 @@ class AnalysisResult:
 class Phase1Orchestrator:
     """Orchestrates the complete Phase 1 discovery and planning process"""
     
-    def __init__(self, api_key: str, output_dir: str = "./phase1_output"):
+    def __init__(self, api_key: str, output_dir: str = "./phase1_output", use_cache: bool = True,
+                 model: str = DEFAULT_LLM_MODEL):
         self.api_key = api_key
+        self.model = model
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
-        # Initialize analyzer
-        self.analyzer = GuruCardAnalyzer("./guru_cards_export", api_key)
+        # Content-addressed cache of LLM analyses, so unchanged sources are not re-analyzed
+        self.use_cache = use_cache
+        self.llm_cache_dir = self.output_dir / ".llm_cache"
+        self.llm_cache_dir.mkdir(exist_ok=True)
         
         # Data tracking
         self.data_sources: List[DataSource] = []
@@ -69,6 +245,17 @@ class Phase1Orchestrator:
         self.card_requirements: List[CardRequirement] = []
         self.organizational_structure = {}
         
+        # Filled by the single workspace walk in discover_data_sources
+        self._top_level_files: List[str] = []
+        self._readme_paths: List[Path] = []
+        
+        # Bounds concurrent LLM analysis requests
+        self._analysis_semaphore = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
+        
+        # Pace requests and estimated tokens under OpenAI's limits instead of hitting 429s
+        self._request_limiter = TokenBucket(LLM_REQUESTS_PER_SECOND, 1)
+        self._token_limiter = TokenBucket(LLM_TOKENS_PER_MINUTE, 60)
+        
         # Create CSV files for tracking
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         self.data_sources_csv = self.output_dir / f"data_sources_{timestamp}.csv"
@@ -77,35 +264,63 @@ class Phase1Orchestrator:
         
         self.init_csv_files()
     
+    @cached_property
+    def analyzer(self):
+        """Guru card analyzer, imported and built on first use"""
+        from analyzer import GuruCardAnalyzer
+        return GuruCardAnalyzer("./guru_cards_export", self.api_key)
+    
+    @cached_property
+    def openai(self):
+        """One OpenAI client for every analysis call so its connection pool stays warm;
+        retries are handled by _call_llm_for_analysis. Imported on first use."""
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, max_retries=0, timeout=60.0)
+    
+    async def aclose(self):
+        """Release the OpenAI client's HTTP connections, if one was created"""
+        if 'openai' in self.__dict__:
+            await self.openai.close()
+
     def init_csv_files(self):
-        """Initialize CSV files for tracking progress"""
+        """Initialize CSV files for tracking progress.
+        Each file stays open (block-buffered) for the whole run; call close() when done."""
         # Data sources tracking
-        with open(self.data_sources_csv, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['name', 'type', 'path', 'priority', 'last_updated', 'analysis_status'])
+        self._data_sources_fh = open(self.data_sources_csv, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_BYTES)
+        self._data_sources_writer = csv.writer(self._data_sources_fh)
+        self._data_sources_writer.writerow(['name', 'type', 'path', 'priority', 'last_updated', 'analysis_status'])
         
         # Card requirements tracking
-        with open(self.card_requirements_csv, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                'title', 'target_audience', 'primary_purpose', 'priority_level',
-                'data_sources', 'sme_contact', 'estimated_complexity', 'dependencies',
-                'confidence_score', 'category', 'evidence_count'
-            ])
+        self._card_requirements_fh = open(self.card_requirements_csv, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_BYTES)
+        self._card_requirements_writer = csv.writer(self._card_requirements_fh)
+        self._card_requirements_writer.writerow([
+            'title', 'target_audience', 'primary_purpose', 'priority_level',
+            'data_sources', 'sme_contact', 'estimated_complexity', 'dependencies',
+            'confidence_score', 'category', 'evidence_count'
+        ])
         
         # Analysis log
-        with open(self.analysis_log_csv, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                'data_source', 'timestamp', 'cards_identified', 'knowledge_gaps_found',
-                'repeated_questions_found', 'undocumented_processes_found',
-                'prompt_tokens', 'completion_tokens', 'total_tokens'
-            ])
+        self._analysis_log_fh = open(self.analysis_log_csv, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_BYTES)
+        self._analysis_log_writer = csv.writer(self._analysis_log_fh)
+        self._analysis_log_writer.writerow([
+            'data_source', 'timestamp', 'cards_identified', 'knowledge_gaps_found',
+            'repeated_questions_found', 'undocumented_processes_found',
+            'prompt_tokens', 'completion_tokens', 'total_tokens'
+        ])
+
+    def close(self):
+        """Flush and close the tracking CSV files"""
+        for fh in (self._data_sources_fh, self._card_requirements_fh, self._analysis_log_fh):
+            if not fh.closed:
+                fh.close()
 
     async def discover_data_sources(self):
         """Step 1.1: Automatically discover available data sources"""
         print("🔍 Discovering data sources...")
         
+        # One pruned walk of the workspace feeds every discovery step below
+        self._top_level_files, self._readme_paths = self._scan_workspace()
+        
         # GitHub repositories (scan current directory structure)
         await self._discover_github_repos()
         
@@ -124,6 +339,38 @@ class Phase1Orchestrator:
         print(f"📋 Discovered {len(self.data_sources)} data sources")
         self._save_data_sources()
 
+    def _scan_workspace(self, root: Path = Path(".")):
+        """Walk the workspace once, returning its top-level file names and README files at any depth.
+        Directories in SKIP_DIRS or deeper than MAX_SCAN_DEPTH are pruned before they are entered,
+        and symlinked directories are not followed, so link cycles cannot trap the walk."""
+        top_level_files = []
+        readme_paths = []
+        pending = [(root, 0)]
+        while pending:
+            directory, depth = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS and depth < MAX_SCAN_DEPTH:
+                                pending.append((Path(entry.path), depth + 1))
+                        elif entry.is_file():
+                            if directory == root:
+                                top_level_files.append(entry.name)
+                            if entry.name.startswith("README"):
+                                readme_paths.append(Path(entry.path))
+            except OSError as e:
+                print(f"⚠️ Could not scan {directory}: {e}")
+        return sorted(top_level_files), sorted(readme_paths)
+
+    def _match_top_level(self, patterns: List[str]) -> List[Path]:
+        """Top-level files matching each glob pattern, in pattern order"""
+        return [
+            Path(name)
+            for pattern in patterns
+            for name in fnmatch.filter(self._top_level_files, pattern)
+        ]
+
     async def _discover_github_repos(self):
         """Discover GitHub repositories and documentation"""
         current_dir = Path(".")
@@ -138,14 +385,13 @@ class Phase1Orchestrator:
             ))
         
         # Look for README files
-        for readme in current_dir.glob("**/README*"):
-            if not any(skip in str(readme) for skip in ["node_modules", ".git", "__pycache__"]):
-                self.data_sources.append(DataSource(
-                    name=f"README: {readme.parent.name}",
-                    type="documentation",
-                    path=str(readme),
-                    priority="important"
-                ))
+        for readme in self._readme_paths:
+            self.data_sources.append(DataSource(
+                name=f"README: {readme.parent.name}",
+                type="documentation",
+                path=str(readme),
+                priority="important"
+            ))
 
     async def _discover_guru_exports(self):
         """Discover existing Guru card exports"""
@@ -159,7 +405,7 @@ class Phase1Orchestrator:
             ))
         
         # Look for processed card files
-        for card_file in Path(".").glob("guru_cards_*.json"):
+        for card_file in self._match_top_level(["guru_cards_*.json"]):
             self.data_sources.append(DataSource(
                 name=f"Processed Cards: {card_file.name}",
                 type="guru_processed",
@@ -184,15 +430,13 @@ class Phase1Orchestrator:
                 ))
         
         # Find standalone documentation files
-        for pattern in doc_patterns:
-            for doc_file in Path(".").glob(pattern):
-                if not any(skip in str(doc_file) for skip in ["node_modules", ".git"]):
-                    self.data_sources.append(DataSource(
-                        name=f"Doc: {doc_file.name}",
-                        type="documentation",
-                        path=str(doc_file),
-                        priority="important"
-                    ))
+        for doc_file in self._match_top_level(doc_patterns):
+            self.data_sources.append(DataSource(
+                name=f"Doc: {doc_file.name}",
+                type="documentation",
+                path=str(doc_file),
+                priority="important"
+            ))
 
     async def _discover_config_files(self):
         """Discover configuration files"""
@@ -202,86 +446,97 @@ class Phase1Orchestrator:
             "tsconfig.json", "next.config.js", "tailwind.config.js"
         ]
         
-        for pattern in config_patterns:
-            for config_file in Path(".").glob(pattern):
-                if not any(skip in str(config_file) for skip in ["node_modules", ".git"]):
-                    self.data_sources.append(DataSource(
-                        name=f"Config: {config_file.name}",
-                        type="configuration",
-                        path=str(config_file),
-                        priority="important"
-                    ))
+        for config_file in self._match_top_level(config_patterns):
+            self.data_sources.append(DataSource(
+                name=f"Config: {config_file.name}",
+                type="configuration",
+                path=str(config_file),
+                priority="important"
+            ))
 
     async def _discover_tech_stack(self):
         """Discover tech stack related files"""
         # Look for deployment and infrastructure files
         infra_patterns = ["vercel.json", "netlify.toml", "*.yml", "*.yaml"]
         
-        for pattern in infra_patterns:
-            for infra_file in Path(".").glob(pattern):
-                if not any(skip in str(infra_file) for skip in ["node_modules", ".git"]):
-                    self.data_sources.append(DataSource(
-                        name=f"Infrastructure: {infra_file.name}",
-                        type="infrastructure",
-                        path=str(infra_file),
-                        priority="nice-to-have"
-                    ))
+        for infra_file in self._match_top_level(infra_patterns):
+            self.data_sources.append(DataSource(
+                name=f"Infrastructure: {infra_file.name}",
+                type="infrastructure",
+                path=str(infra_file),
+                priority="nice-to-have"
+            ))
 
     async def analyze_data_sources(self):
         """Step 1.2: LLM-driven gap analysis of each data source"""
         print(f"\n🤖 Analyzing {len(self.data_sources)} data sources...")
         
-        for i, data_source in enumerate(self.data_sources, 1):
-            print(f"📊 Analyzing {i}/{len(self.data_sources)}: {data_source.name}")
-            
-            try:
-                data_source.analysis_status = "analyzing"
-                result = await self._analyze_single_source(data_source)
-                
-                self.analysis_results.append(result)
-                data_source.analysis_status = "complete"
-                
-                # Log progress
-                self._log_analysis_result(result)
-                
-            except Exception as e:
-                print(f"❌ Error analyzing {data_source.name}: {e}")
+        # Dispatch every source at once; the semaphore bounds in-flight LLM requests
+        results = await asyncio.gather(
+            *[self._analyze_single_source(data_source, i) for i, data_source in enumerate(self.data_sources, 1)],
+            return_exceptions=True
+        )
+        
+        for data_source, result in zip(self.data_sources, results):
+            if isinstance(result, Exception):
+                print(f"❌ Error analyzing {data_source.name}: {result}")
                 data_source.analysis_status = "error"
+                continue
+            
+            self.analysis_results.append(result)
+            data_source.analysis_status = "complete"
+        
+        # Log all results in one batch
+        self._log_analysis_results(self.analysis_results)
+        if self.use_cache:
+            await asyncio.to_thread(self._prune_llm_cache)
         
         print(f"✅ Analysis complete. Found {sum(len(r.cards_identified) for r in self.analysis_results)} potential cards")
 
-    async def _analyze_single_source(self, data_source: DataSource) -> AnalysisResult:
+    async def _analyze_single_source(self, data_source: DataSource, index: int = 0) -> AnalysisResult:
         """Analyze a single data source using LLM"""
-        
-        # Read the content based on source type
-        content = await self._read_data_source_content(data_source)
-        
-        # Create analysis prompt
-        prompt = self._create_analysis_prompt(data_source, content)
-        
-        # Call LLM for analysis
-        response = await self._call_llm_for_analysis(prompt)
-        
-        # Parse response into structured result
-        return self._parse_analysis_response(data_source.name, response)
+        async with self._analysis_semaphore:
+            print(f"📊 Analyzing {index}/{len(self.data_sources)}: {data_source.name}")
+            data_source.analysis_status = "analyzing"
+            
+            # Read the content based on source type
+            content = await self._read_data_source_content(data_source)
+            
+            # Create analysis prompt
+            prompt = self._create_analysis_prompt(data_source, content)
+            
+            # Call LLM for analysis
+            response = await self._call_llm_for_analysis(prompt)
+            
+            # Parse response into structured result
+            return self._parse_analysis_response(data_source.name, response)
 
     async def _read_data_source_content(self, data_source: DataSource) -> str:
-        """Read content from data source based on type"""
+        """Read content from data source based on type, off the event loop so reads overlap LLM calls"""
+        return await asyncio.to_thread(self._read_data_source_content_sync, data_source)
+
+    def _read_data_source_content_sync(self, data_source: DataSource) -> str:
+        """Blocking file reads behind _read_data_source_content"""
         path = Path(data_source.path)
         
         if data_source.type == "documentation":
-            return path.read_text(encoding='utf-8', errors='ignore')
+            return _read_head(path, SOURCE_HEAD_BYTES)
         
         elif data_source.type == "configuration":
-            return path.read_text(encoding='utf-8', errors='ignore')
+            return _read_head(path, SOURCE_HEAD_BYTES)
         
         elif data_source.type == "guru_processed":
             # Load and summarize guru cards
-            with open(path, 'r', encoding='utf-8') as f:
-                cards_data = json.load(f)
+            if ijson is not None:
+                # Stop parsing once the sample is collected; the total count is not known then
+                with open(path, 'rb') as f:
+                    cards_data = list(islice(ijson.items(f, 'item'), GURU_CARD_SAMPLE_SIZE))
+                summary = f"Existing Guru Cards (first {len(cards_data)} cards):\n"
+            else:
+                cards_data = _json_loads(path.read_bytes())
+                summary = f"Existing Guru Cards ({len(cards_data)} cards):\n"
             
-            summary = f"Existing Guru Cards ({len(cards_data)} cards):\n"
-            for card in cards_data[:10]:  # Limit to first 10 for analysis
+            for card in cards_data[:GURU_CARD_SAMPLE_SIZE]:  # Limit to a sample for analysis
                 summary += f"- {card.get('title', 'Untitled')}: {card.get('content', '')[:200]}...\n"
             return summary
         
@@ -289,8 +544,10 @@ class Phase1Orchestrator:
             # Summarize documentation directory
             summary = f"Documentation directory: {path}\n"
             for doc_file in path.glob("**/*.md"):
+                if not SKIP_DIRS.isdisjoint(doc_file.parts):
+                    continue
                 try:
-                    content = doc_file.read_text(encoding='utf-8', errors='ignore')
+                    content = _read_head(doc_file, DOC_DIR_HEAD_BYTES)
                     summary += f"\n{doc_file.name}:\n{content[:300]}...\n"
                 except:
                     continue
@@ -302,93 +559,122 @@ class Phase1Orchestrator:
     def _create_analysis_prompt(self, data_source: DataSource, content: str) -> str:
         """Create LLM prompt for analyzing data source"""
         
-        return f"""
-You are analyzing a data source to identify what Guru cards need to exist for a development team.
-
-DATA SOURCE: {data_source.name}
-TYPE: {data_source.type}
-PRIORITY: {data_source.priority}
-
-CONTENT:
-{content[:8000]}  # Limit content to prevent token overflow
-
-Based on this data source, identify:
-
-1. REQUIRED GURU CARDS: What specific cards would help team members work effectively with this system/process?
-
-2. KNOWLEDGE GAPS: What information is missing that new team members would need?
-
-3. REPEATED QUESTIONS: What questions would people likely ask about this content?
-
-4. UNDOCUMENTED PROCESSES: What processes are implied but not clearly documented?
-
-CRITICAL CARD NAMING REQUIREMENTS:
-- Card titles MUST start with: Who, What, Where, Why, OR How
-- Focus on PAIN addressed, NOT audience or purpose
-- Examples: "HOW to Deploy the API", "WHAT are our Database Dependencies", "WHERE to Find Error Logs"
-
-USER CATEGORIES (identify which applies):
-- Tech Reader - NEW HIRE: Needs to learn from scratch, one-time learning
-- Tech Reader - YOUR TEAM: Knows their domain, building frequently 
-- Tech Reader - OTHER TEAM: Knows their domain, specific integration need
-- Biz Team Reader: Needs direct answers, no technical details
-- YOU (Expert): Deep knowledge, building advanced features
-
-For each potential Guru card, provide:
-- Title (MUST start with Who/What/Where/Why/How and address specific pain)
-- Target Audience (one of the 5 user categories above)
-- Primary Purpose (what specific pain/problem it solves)
-- Priority Level (critical/important/nice-to-have)
-- Estimated Complexity (simple/medium/complex)
-- Evidence (specific examples from the content that support this need)
-
-Format your response as JSON:
-{{
-  "cards_identified": [
-    {{
-      "title": "HOW to configure X for Y",
-      "target_audience": "Tech Reader - NEW HIRE",
-      "primary_purpose": "Solve the pain of not knowing how to set up X when Y condition exists",
-      "priority_level": "critical",
-      "estimated_complexity": "medium",
-      "evidence": ["Specific quote or reference from content"],
-      "category": "technical"
-    }}
-  ],
-  "knowledge_gaps": ["Gap 1", "Gap 2"],
-  "repeated_questions": ["Question 1", "Question 2"],
-  "undocumented_processes": ["Process 1", "Process 2"]
-}}
-"""
+        return (
+            f"{ANALYSIS_PROMPT_HEAD}{data_source.name}\n"
+            f"TYPE: {data_source.type}\n"
+            f"PRIORITY: {data_source.priority}\n\n"
+            f"CONTENT:\n{content[:8000]}{ANALYSIS_PROMPT_TAIL}"
+        )
 
     async def _call_llm_for_analysis(self, prompt: str) -> Dict[str, Any]:
         """Call OpenAI API for analysis"""
-        from openai import AsyncOpenAI
-        
-        client = AsyncOpenAI(api_key=self.api_key)
-        
-        response = await client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert technical documentation analyst helping identify knowledge management needs."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            max_tokens=4000
-        )
+        # Key on the model too, so switching --model never returns another model's analysis
+        cache_key = hashlib.sha256(f"{self.model}\0{prompt}".encode('utf-8')).hexdigest()
+        cache_path = self.llm_cache_dir / f"{cache_key}.json"
+        if self.use_cache and cache_path.exists():
+            try:
+                result = _json_loads(cache_path.read_bytes())
+                os.utime(cache_path)  # Mark as recently used so pruning keeps it
+                return result
+            except (OSError, json.JSONDecodeError):
+                pass  # Unreadable entry: fall through and re-analyze
+        
+        estimated_tokens = len(prompt) // 4 + LLM_MAX_COMPLETION_TOKENS
+        for attempt in range(LLM_MAX_ATTEMPTS):
+            await self._request_limiter.acquire()
+            await self._token_limiter.acquire(estimated_tokens)
+            try:
+                response = await self.openai.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        ANALYSIS_SYSTEM_MESSAGE,
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.1,
+                    max_tokens=LLM_MAX_COMPLETION_TOKENS,
+                    # JSON mode: the model must return a single JSON object, no surrounding prose
+                    response_format={"type": "json_object"}
+                )
+                break
+            except Exception as e:
+                error_kind = self._classify_llm_error(e)
+                if error_kind is None or attempt == LLM_MAX_ATTEMPTS - 1:
+                    raise
+                delay = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+                if error_kind == "rate_limit":
+                    print(f"⏳ Rate limited by OpenAI, retrying in {delay:.0f}s (attempt {attempt + 1}/{LLM_MAX_ATTEMPTS})")
+                else:
+                    print(f"⚠️ Transient OpenAI error ({e}), retrying in {delay:.0f}s (attempt {attempt + 1}/{LLM_MAX_ATTEMPTS})")
+                await asyncio.sleep(delay)
         
         # Parse JSON response
         content = response.choices[0].message.content
         try:
-            return json.loads(content)
+            result = _json_loads(content)
         except json.JSONDecodeError:
-            # If JSON parsing fails, return structured error
+            # JSON mode makes this rare (e.g. output cut off at max_tokens); return a structured
+            # error that is not cached, so the next run retries
+            print(f"⚠️ {self.model} returned invalid JSON despite JSON mode")
             return {
                 "cards_identified": [],
                 "knowledge_gaps": [f"Failed to parse analysis for this source: {content[:200]}"],
                 "repeated_questions": [],
                 "undocumented_processes": []
             }
+        
+        if self.use_cache:
+            self._write_llm_cache(cache_path, result)
+        return result
+
+    def _write_llm_cache(self, cache_path: Path, result: Dict[str, Any]):
+        """Atomically write a cache entry so concurrent or interrupted runs never see partial JSON"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.llm_cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_json_dumps(result))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"⚠️ Could not write LLM cache entry {cache_path.name}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _prune_llm_cache(self):
+        """Delete all but the LLM_CACHE_MAX_ENTRIES most recently used cache entries"""
+        entries = []
+        with os.scandir(self.llm_cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        entries.append((entry.stat().st_mtime_ns, entry.path))
+                    except OSError:
+                        continue
+        if len(entries) <= LLM_CACHE_MAX_ENTRIES:
+            return
+        entries.sort(reverse=True)
+        for _, path in entries[LLM_CACHE_MAX_ENTRIES:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _classify_llm_error(self, error: Exception) -> Optional[str]:
+        """Return "rate_limit" or "transient" for retryable OpenAI errors, None otherwise"""
+        from openai import RateLimitError, APIStatusError, APIConnectionError
+        
+        if isinstance(error, RateLimitError):
+            return "rate_limit"
+        if isinstance(error, APIStatusError):
+            if error.status_code == 429:
+                return "rate_limit"
+            if error.status_code in RETRYABLE_STATUS_CODES:
+                return "transient"
+            return None
+        if isinstance(error, APIConnectionError):  # Includes timeouts
+            return "transient"
+        message = str(error).lower()
+        if "rate limit" in message or "quota" in message:
+            return "rate_limit"
+        return None
 
     def _parse_analysis_response(self, source_name: str, response: Dict[str, Any]) -> AnalysisResult:
         """Parse LLM response into AnalysisResult"""
@@ -441,32 +727,38 @@ Format your response as JSON:
     def _deduplicate_cards(self, cards: List[CardRequirement]) -> List[CardRequirement]:
         """Remove duplicate cards and merge similar ones"""
         # Simple deduplication by title similarity
-        unique_cards = {}
-        
+        groups: Dict[str, List[CardRequirement]] = {}
         for card in cards:
             # Normalize title for comparison
-            normalized_title = card.title.lower().strip()
+            groups.setdefault(card.title.lower().strip(), []).append(card)
+        
+        merged_cards = []
+        for members in groups.values():
+            # The first card seen represents the group; merge the others into it
+            card = members[0]
+            ranked = sorted(members, key=lambda m: m.confidence_score, reverse=True)
+            card.data_sources = list(dict.fromkeys(
+                source for member in members for source in member.data_sources
+            ))
+            card.confidence_score = ranked[0].confidence_score
             
-            if normalized_title in unique_cards:
-                # Merge with existing card
-                existing = unique_cards[normalized_title]
-                existing.data_sources.extend(card.data_sources)
-                existing.evidence_snippets.extend(card.evidence_snippets)
-                existing.confidence_score = max(existing.confidence_score, card.confidence_score)
-            else:
-                unique_cards[normalized_title] = card
-        
-        return list(unique_cards.values())
+            # Keep at most MAX_EVIDENCE_SNIPPETS distinct snippets, most confident cards first
+            evidence = {}
+            for member in ranked:
+                for snippet in member.evidence_snippets:
+                    evidence[snippet] = None
+                    if len(evidence) == MAX_EVIDENCE_SNIPPETS:
+                        break
+                if len(evidence) == MAX_EVIDENCE_SNIPPETS:
+                    break
+            card.evidence_snippets = list(evidence)
+            merged_cards.append(card)
+        
+        return merged_cards
 
     def _enhance_card_metadata(self, cards: List[CardRequirement]) -> List[CardRequirement]:
         """Add additional metadata to cards"""
         for card in cards:
-            # Remove duplicate data sources
-            card.data_sources = list(set(card.data_sources))
-            
-            # Remove duplicate evidence
-            card.evidence_snippets = list(set(card.evidence_snippets))
-            
             # Ensure priority level is valid
             if card.priority_level not in ["critical", "important", "nice-to-have"]:
                 card.priority_level = "nice-to-have"
@@ -475,38 +767,37 @@ Format your response as JSON:
 
     def _save_data_sources(self):
         """Save data sources to CSV"""
-        with open(self.data_sources_csv, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            for source in self.data_sources:
-                writer.writerow([
-                    source.name, source.type, source.path, 
-                    source.priority, source.last_updated, source.analysis_status
-                ])
+        self._data_sources_writer.writerows(
+            [source.name, source.type, source.path,
+             source.priority, source.last_updated, source.analysis_status]
+            for source in self.data_sources
+        )
+        self._data_sources_fh.flush()
 
     def _save_card_requirements(self):
         """Save card requirements to CSV"""
-        with open(self.card_requirements_csv, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            for card in self.card_requirements:
-                writer.writerow([
-                    card.title, card.target_audience, card.primary_purpose,
-                    card.priority_level, ';'.join(card.data_sources), card.sme_contact,
-                    card.estimated_complexity, ';'.join(card.dependencies),
-                    card.confidence_score, card.category, len(card.evidence_snippets)
-                ])
-
-    def _log_analysis_result(self, result: AnalysisResult):
-        """Log analysis result to CSV"""
-        with open(self.analysis_log_csv, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                result.data_source, result.analysis_timestamp,
-                len(result.cards_identified), len(result.knowledge_gaps),
-                len(result.repeated_questions), len(result.undocumented_processes),
-                result.token_usage.get("prompt", 0),
-                result.token_usage.get("completion", 0),
-                result.token_usage.get("total", 0)
-            ])
+        rows = [
+            (card.title, card.target_audience, card.primary_purpose,
+             card.priority_level, ';'.join(card.data_sources), card.sme_contact,
+             card.estimated_complexity, ';'.join(card.dependencies),
+             card.confidence_score, card.category, len(card.evidence_snippets))
+            for card in self.card_requirements
+        ]
+        self._card_requirements_writer.writerows(rows)
+        self._card_requirements_fh.flush()
+
+    def _log_analysis_results(self, results: List[AnalysisResult]):
+        """Log a batch of analysis results to CSV"""
+        self._analysis_log_writer.writerows(
+            [result.data_source, result.analysis_timestamp,
+             len(result.cards_identified), len(result.knowledge_gaps),
+             len(result.repeated_questions), len(result.undocumented_processes),
+             result.token_usage.get("prompt", 0),
+             result.token_usage.get("completion", 0),
+             result.token_usage.get("total", 0)]
+            for result in results
+        )
+        self._analysis_log_fh.flush()
 
     def generate_summary_report(self):
         """Generate final summary report"""
@@ -522,8 +813,7 @@ Format your response as JSON:
             f.write("## 📊 Data Sources Analyzed\n\n")
             f.write(f"**Total Sources:** {len(self.data_sources)}\n\n")
             
-            for source_type in set(s.type for s in self.data_sources):
-                count = len([s for s in self.data_sources if s.type == source_type])
+            for source_type, count in Counter(s.type for s in self.data_sources).items():
                 f.write(f"- **{source_type}:** {count}\n")
             
             # Card Requirements Summary
@@ -531,14 +821,13 @@ Format your response as JSON:
             f.write(f"**Total Cards:** {len(self.card_requirements)}\n\n")
             
             # Priority breakdown
+            priority_counts = Counter(c.priority_level for c in self.card_requirements)
             for priority in ["critical", "important", "nice-to-have"]:
-                count = len([c for c in self.card_requirements if c.priority_level == priority])
-                f.write(f"- **{priority.title()}:** {count}\n")
+                f.write(f"- **{priority.title()}:** {priority_counts[priority]}\n")
             
             # Category breakdown
             f.write(f"\n### By Category\n\n")
-            for category in set(c.category for c in self.card_requirements):
-                count = len([c for c in self.card_requirements if c.category == category])
+            for category, count in Counter(c.category for c in self.card_requirements).items():
                 f.write(f"- **{category.title()}:** {count}\n")
             
             # High priority cards
@@ -576,21 +865,37 @@ async def main():
     parser = argparse.ArgumentParser(description="Phase 1: Organizational Discovery & Planning")
     parser.add_argument("--api-key", required=True, help="OpenAI API key")
     parser.add_argument("--output-dir", default="./phase1_output", help="Output directory")
+    parser.add_argument("--no-cache", action="store_true", help="Re-analyze every source, ignoring cached LLM results")
+    parser.add_argument("--model", default=DEFAULT_LLM_MODEL, help="OpenAI model used to analyze sources")
     
     args = parser.parse_args()
     
     # Initialize orchestrator
-    orchestrator = Phase1Orchestrator(args.api_key, args.output_dir)
+    orchestrator = Phase1Orchestrator(args.api_key, args.output_dir, use_cache=not args.no_cache,
+                                      model=args.model)
     
     print("🚀 Starting Phase 1: Organizational Discovery & Planning")
     
     # Execute all steps
-    await orchestrator.discover_data_sources()
-    await orchestrator.analyze_data_sources()
-    orchestrator.consolidate_card_requirements()
-    orchestrator.generate_summary_report()
+    try:
+        await orchestrator.discover_data_sources()
+        await orchestrator.analyze_data_sources()
+        orchestrator.consolidate_card_requirements()
+        orchestrator.generate_summary_report()
+    finally:
+        await orchestrator.aclose()
+        orchestrator.close()
     
     print("\n✅ Phase 1 complete! Review the outputs and proceed to human review & prioritization.")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    try:
+        import uvloop  # libuv-based event loop, cheaper scheduling for many concurrent HTTP requests
+    except ImportError:
+        asyncio.run(main())
+    else:
+        if hasattr(uvloop, "run"):
+            uvloop.run(main())
+        else:
+            uvloop.install()  # uvloop < 0.18 has no uvloop.run
+            asyncio.run(main()) 
\ No newline at end of file